@@ -0,0 +1,30 @@
+// Presentation-only options, applied to the figure held in the browser
+// instead of rebuilding it on the server.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    figures: {
+        setGeoScope: function (figure, scope) {
+            if (!figure) {
+                return window.dash_clientside.no_update;
+            }
+            const geo = Object.assign({}, figure.layout.geo, {
+                scope: scope || "world",
+                lataxis: (scope || "world") === "world" ? {range: [-40, 90]} : {},
+            });
+            return Object.assign({}, figure, {
+                layout: Object.assign({}, figure.layout, {geo: geo}),
+            });
+        },
+
+        setLogAxis: function (figure, options) {
+            if (!figure) {
+                return window.dash_clientside.no_update;
+            }
+            const yaxis = Object.assign({}, figure.layout.yaxis, {
+                type: (options || []).includes("log-y") ? "log" : "linear",
+            });
+            return Object.assign({}, figure, {
+                layout: Object.assign({}, figure.layout, {yaxis: yaxis}),
+            });
+        },
+    },
+});
@@ -0,0 +1,165 @@
+import datetime as dt
+import hashlib
+
+import numpy as np
+from flask import Blueprint, Response, abort, jsonify, request
+
+MAX_PER_PAGE = 200
+
+
+class ApiIndex:
+    """Precomputed, sorted aggregates of the world view with offset indexes, so
+    that each request is a dictionary lookup and an array slice."""
+
+    def __init__(self, world_view_df):
+        data = world_view_df.reset_index().loc[
+            :, ["ISO2", "Country", "date", "Artist", "Genre", "Streams"]
+        ]
+        data.loc[:, "week"] = data["date"].dt.strftime("%Y-%m-%d")
+
+        self.weeks = sorted(data["week"].unique())
+        self.countries = (
+            data.drop_duplicates("ISO2").set_index("ISO2")["Country"].sort_index()
+        )
+        self.version = f"{self.weeks[-1]}-{len(data)}" if self.weeks else "empty"
+
+        # Artists ranked by streams within each country-week
+        top = data.sort_values(
+            ["ISO2", "week", "Streams"], ascending=[True, True, False]
+        )
+        self.top_artists = top.loc[:, ["Artist", "Genre", "Streams"]].to_numpy()
+        self.top_artist_offsets = self._offsets(top, ["ISO2", "week"])
+
+        # Weekly streams per artist, across all countries and per country
+        world_series = data.groupby(["Artist", "week"])["Streams"].sum().reset_index()
+        self.world_series = world_series.loc[:, ["week", "Streams"]].to_numpy()
+        self.world_series_offsets = self._offsets(world_series, ["Artist"])
+
+        country_series = data.sort_values(["Artist", "ISO2", "week"])
+        self.country_series = country_series.loc[:, ["week", "Streams"]].to_numpy()
+        self.country_series_offsets = self._offsets(country_series, ["Artist", "ISO2"])
+
+    @staticmethod
+    def _offsets(sorted_df, keys):
+        # Map each key to the (start, end) rows of its block in the sorted frame
+        sizes = sorted_df.groupby(keys, sort=True).size()
+        ends = np.cumsum(sizes.to_numpy())
+        starts = ends - sizes.to_numpy()
+        return dict(zip(sizes.index, zip(starts.tolist(), ends.tolist())))
+
+
+def create_blueprint(index_loader):
+    """The API, answered from the ApiIndex returned by `index_loader`, which is
+    built once by the caller, and may abort with a 503 until it is loaded."""
+    api = Blueprint("api", __name__, url_prefix="/api")
+
+    def conditional_json(build_payload):
+        # The ETag depends only on the asset version and the request, so a
+        # matching client is answered without building the payload.
+        index = index_loader()
+        etag = hashlib.sha1(
+            f"{index.version}:{request.full_path}".encode("utf-8")
+        ).hexdigest()
+
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = jsonify(build_payload(index))
+
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = 3600
+        return response
+
+    def paginate(total):
+        page = request.args.get("page", default=1, type=int)
+        per_page = request.args.get("per_page", default=20, type=int)
+        if page < 1 or not 1 <= per_page <= MAX_PER_PAGE:
+            abort(400, f"page must be >= 1 and per_page between 1 and {MAX_PER_PAGE}")
+        start = (page - 1) * per_page
+        return page, per_page, start, min(start + per_page, total)
+
+    @api.errorhandler(400)
+    @api.errorhandler(404)
+    @api.errorhandler(503)
+    def handle_error(error):
+        return jsonify({"error": error.description}), error.code
+
+    @api.route("/countries")
+    def countries():
+        return conditional_json(
+            lambda index: {
+                "results": [
+                    {"iso2": iso2, "country": name}
+                    for iso2, name in index.countries.items()
+                ]
+            }
+        )
+
+    @api.route("/weeks")
+    def weeks():
+        return conditional_json(lambda index: {"results": index.weeks})
+
+    @api.route("/countries/<iso2>/top-artists")
+    def top_artists(iso2):
+        def build_payload(index):
+            country = iso2.upper()
+            # Checked first, so that an index without data never reaches its weeks
+            if country not in index.countries:
+                abort(404, f"Unknown country: {iso2}")
+            week = request.args.get("week", default=index.weeks[-1])
+            try:
+                dt.datetime.strptime(week, "%Y-%m-%d")
+            except ValueError:
+                abort(400, f"week must be a date as YYYY-MM-DD, not: {week}")
+            if (country, week) not in index.top_artist_offsets:
+                abort(404, f"No chart data for {country} in week {week}")
+
+            offset, end = index.top_artist_offsets[(country, week)]
+            page, per_page, start, stop = paginate(end - offset)
+            rows = index.top_artists[offset + start : offset + stop]
+            return {
+                "country": country,
+                "week": week,
+                "page": page,
+                "per_page": per_page,
+                "total": end - offset,
+                "results": [
+                    {
+                        "rank": start + i + 1,
+                        "artist": artist,
+                        "genre": genre,
+                        "streams": int(streams),
+                    }
+                    for i, (artist, genre, streams) in enumerate(rows)
+                ],
+            }
+
+        return conditional_json(build_payload)
+
+    @api.route("/artists/<path:name>/series")
+    def artist_series(name):
+        def build_payload(index):
+            country = request.args.get("country", default=None)
+            if country is None:
+                key = name
+                series, offsets = index.world_series, index.world_series_offsets
+            else:
+                key = (name, country.upper())
+                series, offsets = index.country_series, index.country_series_offsets
+            if key not in offsets:
+                abort(404, f"No chart data for artist: {name}")
+
+            start, end = offsets[key]
+            return {
+                "artist": name,
+                "country": country.upper() if country else None,
+                "results": [
+                    {"week": week, "streams": int(streams)}
+                    for week, streams in series[start:end]
+                ],
+            }
+
+        return conditional_json(build_payload)
+
+    return api
@@ -3,7 +3,10 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
-from spotify_dash.core.content import SILVER
+from spotify_dash.core import engine
+
+# Imported as a module: content imports this module in turn
+import spotify_dash.core.content as cnt
 
 SEQ_COLS = px.colors.sequential.Agsunset
 
@@ -21,7 +24,7 @@ def bg(plot_bg_colour=None, plot_paper_colour=None):
                 {
                     "plot_bgcolor": plot_bg_colour,
                     "paper_bgcolor": plot_paper_colour,
-                    "font_color": SILVER,
+                    "font_color": cnt.SILVER,
                 }
             )
             fig.update_layout(margin=dict(l=0, r=0, t=0, b=0))
@@ -33,14 +36,16 @@ def bg(plot_bg_colour=None, plot_paper_colour=None):
 
 
 @bg()
-def world_choropleth(chart_data: pd.DataFrame, scope=None):
+def world_choropleth(chart_data: pd.DataFrame, scope=None, colour=None):
     if scope is None:
         scope = "world"
+    if colour is None:
+        colour = "Streams (log10)"
     chart_data.loc[:, "Streams (log10)"] = np.log(chart_data["Streams"])
     fig = px.choropleth(
         data_frame=chart_data,
         locations=chart_data["ISO3"],
-        color="Streams (log10)",
+        color=colour,
         hover_name="Country",
         hover_data={
             "ISO3": False,
@@ -48,6 +53,7 @@ def world_choropleth(chart_data: pd.DataFrame, scope=None):
             "Streams": ":,0f",
             "Top Artist": True,
             "Top Genre": True,
+            **({colour: ":.2f"} if colour != "Streams (log10)" else {}),
         },
         locationmode="ISO-3",
         color_continuous_scale=SEQ_COLS,
@@ -60,10 +66,11 @@ def world_choropleth(chart_data: pd.DataFrame, scope=None):
         bgcolor="rgba(0,0,0,0)",
         showcountries=False,
         showland=True,
-        landcolor=SILVER,
+        landcolor=cnt.SILVER,
         lataxis={"range": [-40, 90]} if scope == "world" else None,
     )
-    fig.update_layout(dict(coloraxis_colorbar=dict(tickprefix="10e")))
+    if colour == "Streams (log10)":
+        fig.update_layout(dict(coloraxis_colorbar=dict(tickprefix="10e")))
 
     return fig
 
@@ -80,14 +87,14 @@ def country_sunburst(chart_data):
 
 
 @bg()
-def artist_trends(chart_data, log=False):
+def artist_trends(chart_data, log=False, color="Artist"):
     if not chart_data.empty:
         fig = px.line(
             data_frame=chart_data,
             x="date",
             y="Streams",
             labels={"date": "Date"},
-            color="Artist",
+            color=color,
         )
     else:
         fig = go.Figure()
@@ -97,9 +104,9 @@ def artist_trends(chart_data, log=False):
         visible=True,
         showgrid=True,
         gridwidth=1,
-        gridcolor=SILVER,
+        gridcolor=cnt.SILVER,
         zerolinewidth=1,
-        zerolinecolor=SILVER,
+        zerolinecolor=cnt.SILVER,
     )
 
     if log:
@@ -127,13 +134,17 @@ def country_tsne_clustering(chart_data, plot3d=False):
                 yaxis_title="Y",
                 zaxis_title="Z",
                 xaxis=dict(
-                    gridcolor=SILVER, showbackground=False, zerolinecolor=SILVER,
+                    gridcolor=cnt.SILVER,
+                    showbackground=False,
+                    zerolinecolor=cnt.SILVER,
                 ),
                 yaxis=dict(
-                    gridcolor=SILVER, showbackground=False, zerolinecolor=SILVER
+                    gridcolor=cnt.SILVER, showbackground=False, zerolinecolor=cnt.SILVER
                 ),
                 zaxis=dict(
-                    gridcolor=SILVER, showbackground=False, zerolinecolor=SILVER,
+                    gridcolor=cnt.SILVER,
+                    showbackground=False,
+                    zerolinecolor=cnt.SILVER,
                 ),
             ),
         )
@@ -150,14 +161,14 @@ def country_tsne_clustering(chart_data, plot3d=False):
             visible=True,
             showgrid=False,
             zerolinewidth=1,
-            zerolinecolor=SILVER,
+            zerolinecolor=cnt.SILVER,
             title_text="X",
         )
         fig.update_yaxes(
             visible=True,
             showgrid=False,
             zerolinewidth=1,
-            zerolinecolor=SILVER,
+            zerolinecolor=cnt.SILVER,
             title_text="Y",
         )
         fig.update_layout(dict(yaxis=dict(scaleanchor="x", scaleratio=1)))
@@ -167,13 +178,9 @@ def country_tsne_clustering(chart_data, plot3d=False):
 
 @bg()
 def genre_tree(chart_data):
-    chart_data = (
-        chart_data.groupby(["Artist", "Genre"])
-        .sum()
-        .sort_values("Streams", ascending=False)
-    )
-    chart_data = chart_data[:100]
-    chart_data = chart_data.reset_index()
+    chart_data = engine.top_k(
+        engine.group_sum(chart_data, ["Artist", "Genre"]), k=100
+    ).reset_index(drop=True)
     fig = px.treemap(
         data_frame=chart_data,
         path=["Genre", "Artist"],
@@ -6,8 +6,8 @@ import numpy as np
 from dash_table.Format import Format
 import datetime as dt
 
-from spotify_dash.core import charts
-from spotify_dash.core import views
+from spotify_dash.core import charts, engine
+from spotify_dash.utils.dates import PERIOD_DAYS
 
 SILVER = "rgb(131, 148, 150)"
 SLATE = "rgb(30, 67, 74)"
@@ -15,16 +15,37 @@ DARK_GREY = "rgb(8, 8, 8)"
 DEEP_TEAL = "rgb(7, 54, 66)"
 
 
-def render_dashboard_status(world_view):
+def render_loading_section():
+    return [
+        dbc.Spinner(color="light", size="lg"),
+        html.P("Loading...", className="lead", style={"color": SILVER}),
+    ]
+
+
+def render_load_error():
+    return [
+        html.P(
+            "The dashboard data could not be loaded. Retrying...",
+            className="lead",
+            style={"color": SILVER},
+        ),
+    ]
+
+
+def render_dashboard_status(world_view, depth=100, granularity="weekly"):
     world_view = world_view.copy().reset_index()
+    period_days = PERIOD_DAYS[granularity]
+    period_name = "weeks" if granularity == "weekly" else "days"
 
     streams = world_view.loc[:, "Streams"].sum()
     artists = world_view.loc[:, "Artist"].nunique()
     genres = world_view.loc[:, "Genre"].nunique()
     countries = world_view.loc[:, "Country"].nunique()
-    weeks = world_view.loc[:, "date"].nunique()
+    periods = world_view.loc[:, "date"].nunique()
     date_start = world_view.loc[:, "date"].min().strftime("%Y-%m-%d")
-    date_end = (world_view.loc[:, "date"].max() + dt.timedelta(6)).strftime("%Y-%m-%d")
+    date_end = (
+        world_view.loc[:, "date"].max() + dt.timedelta(period_days - 1)
+    ).strftime("%Y-%m-%d")
 
     dash_stats = [
         {"name": "Streams", "value": f"{streams:,d}"},
@@ -76,8 +97,8 @@ def render_dashboard_status(world_view):
                                     children=[
                                         dcc.Markdown(
                                             children=[
-                                                "Updated weekly with data for the **top 100** streamed "
-                                                f"tracks in each country over the last **{weeks}** weeks."
+                                                f"Updated weekly with data for the **top {depth}** streamed "
+                                                f"tracks in each country over the last **{periods}** {period_name}."
                                             ]
                                         ),
                                         html.Span(
@@ -120,6 +141,49 @@ def render_dashboard_status(world_view):
     ]
 
 
+def render_date_range(dates):
+    # Label the first chart of each month
+    marks = {
+        i: {"label": date.strftime("%b %y"), "style": {"color": SILVER}}
+        for i, date in enumerate(dates)
+        if i == 0 or date.month != dates[i - 1].month
+    }
+
+    return [
+        dbc.Row(
+            align="center",
+            children=[
+                dbc.Col(
+                    md=12, lg=2, children=html.H4("Period", style={"margin-bottom": 0}),
+                ),
+                dbc.Col(
+                    md=12,
+                    lg=10,
+                    children=dcc.RangeSlider(
+                        id="date-range",
+                        min=0,
+                        max=len(dates) - 1,
+                        step=1,
+                        value=[0, len(dates) - 1],
+                        marks=marks,
+                        allowCross=False,
+                        updatemode="mouseup",
+                    ),
+                ),
+            ],
+        )
+    ]
+
+
+CHOROPLETH_COLOUR_OPTIONS = [
+    {"label": "Streams", "value": "Streams (log10)"},
+    {"label": "Top 10 Artist Share", "value": "Top 10 Artist Share"},
+    {"label": "Artist Concentration (HHI)", "value": "Artist HHI"},
+    {"label": "Genre Concentration (HHI)", "value": "Genre HHI"},
+    {"label": "Genre Diversity (Entropy)", "value": "Genre Entropy"},
+]
+
+
 def render_world_map(choropleth_view):
     scope_options = [
         {"label": "World", "value": "world"},
@@ -144,13 +208,16 @@ def render_world_map(choropleth_view):
                                             md={"size": 12, "order": "first"},
                                             lg={"size": 9, "order": "last"},
                                             xl={"size": 10, "order": "last"},
-                                            children=dcc.Graph(
-                                                id="world-choropleth",
-                                                figure=charts.world_choropleth(
-                                                    choropleth_view,
+                                            children=[
+                                                dcc.Graph(
+                                                    id="world-choropleth",
+                                                    figure=charts.world_choropleth(
+                                                        choropleth_view,
+                                                    ),
+                                                    config={"displayModeBar": False},
                                                 ),
-                                                config={"displayModeBar": False},
-                                            ),
+                                                dcc.Store(id="world-choropleth-store"),
+                                            ],
                                         ),
                                         dbc.Col(
                                             md={"size": 12, "order": "last"},
@@ -168,6 +235,13 @@ def render_world_map(choropleth_view):
                                                                     options=scope_options,
                                                                     value="world",
                                                                 ),
+                                                                html.Br(),
+                                                                dbc.Label("Colour"),
+                                                                dbc.RadioItems(
+                                                                    id="choropleth-colour",
+                                                                    options=CHOROPLETH_COLOUR_OPTIONS,
+                                                                    value="Streams (log10)",
+                                                                ),
                                                             ]
                                                         ),
                                                     )
@@ -185,7 +259,7 @@ def render_world_map(choropleth_view):
     ]
 
 
-def render_country_profile(world_view, country_view):
+def render_country_profile(world_view, country_view, similar_markets):
     country_table_col_dict = [
         {"name": column, "id": column} for column in ["Position", "Artist", "Genre"]
     ] + [
@@ -249,6 +323,32 @@ def render_country_profile(world_view, country_view):
                                     page_current=0,
                                     page_size=10,
                                 ),
+                                html.Br(),
+                                html.H4("Most Similar Markets"),
+                                ddt.DataTable(
+                                    id="similar-markets-table",
+                                    style_table={
+                                        "padding-left": 17,
+                                        "padding-right": 17,
+                                    },
+                                    columns=[
+                                        {"name": column, "id": column}
+                                        for column in ["Similar Market", "Similarity"]
+                                    ],
+                                    data=similar_markets.to_dict("records"),
+                                    style_header={
+                                        "backgroundColor": DEEP_TEAL,
+                                        "color": SILVER,
+                                    },
+                                    style_cell={
+                                        "textAlign": "left",
+                                        "backgroundColor": DEEP_TEAL,
+                                        "color": SILVER,
+                                        "fontSize": 14,
+                                        "font-family": "Helvetica",
+                                    },
+                                    style_as_list_view=True,
+                                ),
                             ],
                         )
                     ],
@@ -269,18 +369,22 @@ def render_country_profile(world_view, country_view):
     ]
 
 
-def render_artists_trends(artist_view, world_view):
-    artist_options = [
+def artist_options(world_view):
+    return [
         {"label": artist, "value": artist}
         for artist in (
-            world_view.groupby("Artist", group_keys=False)["Streams"]
-            .sum()
-            .reset_index()
+            engine.group_sum(world_view, ["Artist"])
             .sort_values(by="Streams", ascending=False)
             .Artist.unique()
         )
     ]
 
+
+def default_artists(artist_view):
+    return list(artist_view.groupby("Artist")["Streams"].sum().sort_values()[:10].index)
+
+
+def render_artists_trends(artist_view, world_view):
     return [
         html.H1("Artist Trends"),
         html.Br(),
@@ -311,10 +415,16 @@ def render_artists_trends(artist_view, world_view):
                     children=dbc.FormGroup(
                         style={"padding-left": 0},
                         children=[
+                            # Applied in the browser, see assets/clientside.js
+                            dbc.Checklist(
+                                id="artist-trends-log-y",
+                                options=[{"label": "Log y Axis", "value": "log-y"}],
+                                value=[],
+                                switch=True,
+                            ),
                             dbc.Checklist(
                                 id="artist-trends-axis-options",
                                 options=[
-                                    {"label": "Log y Axis", "value": "log-y"},
                                     {
                                         "label": "Rolling 4wk Avg.",
                                         "value": "rolling-avg",
@@ -334,6 +444,7 @@ def render_artists_trends(artist_view, world_view):
             figure=charts.artist_trends(artist_view),
             config={"displayModeBar": False},
         ),
+        dcc.Store(id="artist-trends-store"),
         dbc.Row(
             children=[
                 dbc.Col(
@@ -341,11 +452,8 @@ def render_artists_trends(artist_view, world_view):
                     children=dcc.Dropdown(
                         id="artist-trends-selection",
                         style={"padding-left": 0},
-                        options=artist_options,
-                        value=artist_view.groupby("Artist")["Streams"]
-                        .sum()
-                        .sort_values()[:10]
-                        .index,
+                        options=artist_options(world_view),
+                        value=default_artists(artist_view),
                         multi=True,
                     ),
                 ),
@@ -354,7 +462,188 @@ def render_artists_trends(artist_view, world_view):
     ]
 
 
-def render_genre_space(world_view):
+def country_code_options(world_view):
+    countries = (
+        world_view.reset_index()
+        .drop_duplicates("ISO2")
+        .sort_values("Country")
+        .loc[:, ["Country", "ISO2"]]
+    )
+    return [
+        {"label": country, "value": iso2}
+        for country, iso2 in countries.itertuples(index=False)
+    ]
+
+
+def render_track_charts(world_view, top_tracks, track_trends):
+    track_table_col_dict = [
+        {"name": column, "id": column}
+        for column in ["Position", "Track Name", "Artist"]
+    ] + [
+        {
+            "name": "Streams",
+            "id": "Streams",
+            "type": "numeric",
+            "format": Format(group=","),
+        },
+        {"name": "Weeks", "id": "Weeks", "type": "numeric"},
+        {"name": "Peak", "id": "Peak", "type": "numeric"},
+        {"name": "First Week", "id": "First Week"},
+    ]
+
+    return [
+        html.H1("Track Charts", style={"margin-bottom": 20}),
+        dcc.Dropdown(
+            id="track-country-input",
+            style={"padding-left": 0},
+            options=country_code_options(world_view),
+            value="GB",
+            clearable=False,
+        ),
+        html.Br(),
+        dbc.Row(
+            [
+                dbc.Col(
+                    md=12,
+                    lg=6,
+                    children=[
+                        ddt.DataTable(
+                            id="track-table",
+                            columns=track_table_col_dict,
+                            data=top_tracks.loc[
+                                :, [column["id"] for column in track_table_col_dict]
+                            ].to_dict("records"),
+                            style_header={
+                                "backgroundColor": DEEP_TEAL,
+                                "color": SILVER,
+                            },
+                            style_cell={
+                                "textAlign": "left",
+                                "backgroundColor": DEEP_TEAL,
+                                "color": SILVER,
+                                "fontSize": 14,
+                                "font-family": "Helvetica",
+                            },
+                            style_as_list_view=True,
+                            sort_action="native",
+                            page_action="native",
+                            page_current=0,
+                            page_size=10,
+                        ),
+                    ],
+                ),
+                dbc.Col(
+                    md=12,
+                    lg=6,
+                    children=[
+                        dcc.Graph(
+                            id="track-trends",
+                            figure=charts.artist_trends(track_trends, color="Track"),
+                            config={"displayModeBar": False},
+                        ),
+                    ],
+                ),
+            ]
+        ),
+    ]
+
+
+def render_similar_artists(world_view):
+    options = artist_options(world_view)
+
+    return [
+        html.H1("Similar Artists"),
+        html.P(
+            "Listeners in the same markets also stream...",
+            className="lead",
+            style={"margin-bottom": 20},
+        ),
+        dcc.Dropdown(
+            id="similar-artists-input",
+            style={"padding-left": 0},
+            options=options,
+            value=options[0]["value"] if options else None,
+            clearable=False,
+        ),
+        html.Br(),
+        ddt.DataTable(
+            id="similar-artists-table",
+            columns=[
+                {"name": "Artist", "id": "Artist"},
+                {"name": "Similarity", "id": "Similarity", "type": "numeric"},
+            ],
+            style_header={"backgroundColor": DEEP_TEAL, "color": SILVER},
+            style_cell={
+                "textAlign": "left",
+                "backgroundColor": DEEP_TEAL,
+                "color": SILVER,
+                "fontSize": 14,
+                "font-family": "Helvetica",
+            },
+            style_as_list_view=True,
+        ),
+    ]
+
+
+MOVEMENT_TABLE_COLUMNS = {
+    "movement-new-entries": ["Position", "Track Name", "Artist"],
+    "movement-climbers": ["Position", "Change", "Track Name", "Artist"],
+    "movement-longest-running": ["Position", "Weeks On Chart", "Track Name", "Artist"],
+}
+
+
+def render_chart_movement(world_view, new_entries, climbers, longest_running):
+    tables = zip(
+        MOVEMENT_TABLE_COLUMNS.items(),
+        ["New Entries", "Biggest Climbers", "Longest Running"],
+        [new_entries, climbers, longest_running],
+    )
+
+    return [
+        html.H1("Chart Movement", style={"margin-bottom": 20}),
+        dcc.Dropdown(
+            id="movement-country-input",
+            style={"padding-left": 0},
+            options=country_code_options(world_view),
+            value="GB",
+            clearable=False,
+        ),
+        html.Br(),
+        dbc.Row(
+            [
+                dbc.Col(
+                    md=12,
+                    lg=4,
+                    children=[
+                        html.H4(title),
+                        ddt.DataTable(
+                            id=table_id,
+                            columns=[
+                                {"name": column, "id": column} for column in columns
+                            ],
+                            data=movement.loc[:, columns].to_dict("records"),
+                            style_header={
+                                "backgroundColor": DEEP_TEAL,
+                                "color": SILVER,
+                            },
+                            style_cell={
+                                "textAlign": "left",
+                                "backgroundColor": DEEP_TEAL,
+                                "color": SILVER,
+                                "fontSize": 14,
+                                "font-family": "Helvetica",
+                            },
+                            style_as_list_view=True,
+                        ),
+                    ],
+                )
+                for (table_id, columns), title, movement in tables
+            ]
+        ),
+    ]
+
+
+def render_genre_space():
     return [
         html.H1("Genre Affinity Clusters"),
         dbc.Row(
@@ -409,12 +698,11 @@ def render_genre_space(world_view):
                 dbc.Col(
                     width=12,
                     lg=9,
+                    # Drawn by the clustering callback on page load, so t-SNE
+                    # is not fitted while the app starts.
                     children=dcc.Graph(
                         id="country-clustering",
                         style={"margin-top": 15},
-                        figure=charts.country_tsne_clustering(
-                            chart_data=views.tsne_genre_view(world_view),
-                        ),
                         config={"displayModeBar": False},
                     ),
                 ),
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# Aggregations over integer-coded dimensions. Index levels of the world view are
+# already coded by their MultiIndex; columns are factorized. Groups are reduced
+# with np.bincount and ranked with stable sorts, instead of grouping on strings.
+
+
+def dimension(df, name):
+    """Integer codes of an index level or column of `df`, and their labels."""
+    if name in df.index.names:
+        level = df.index.names.index(name)
+        return np.asarray(df.index.codes[level]), df.index.levels[level]
+    column = df[name]
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), column.cat.categories
+    return pd.factorize(column, sort=True)
+
+
+def select(df, name, labels) -> np.ndarray:
+    """Mask of the rows of `df` whose `name` is one of `labels`."""
+    codes, all_labels = dimension(df, name)
+    # Unknown labels are -1, as are missing values, so they must not be matched
+    indexes = all_labels.get_indexer(list(labels))
+    return np.isin(codes, indexes[indexes >= 0])
+
+
+def group_sum(df, keys, value="Streams", mask=None) -> pd.DataFrame:
+    """Sum `value` by `keys`, like df.groupby(keys)[value].sum().reset_index()
+    over the rows in `mask`."""
+    codes, labels = zip(*(dimension(df, key) for key in keys))
+    values = df[value].to_numpy()
+    if mask is not None:
+        codes = [key_codes[mask] for key_codes in codes]
+        values = values[mask]
+
+    flat = np.ravel_multi_index(codes, [len(key_labels) for key_labels in labels])
+    groups, inverse = np.unique(flat, return_inverse=True)
+    sums = np.bincount(inverse, weights=values, minlength=len(groups))
+
+    group_codes = np.unravel_index(groups, [len(key_labels) for key_labels in labels])
+    result = pd.DataFrame(
+        {
+            key: key_labels.take(key_codes)
+            for key, key_labels, key_codes in zip(keys, labels, group_codes)
+        }
+    )
+    result[value] = sums.round().astype("int64")
+    return result
+
+
+def top_k(df, k=1, group=None, value="Streams") -> pd.DataFrame:
+    """The `k` rows of `df` with the largest `value`, in descending order, within
+    each `group` if given. Ties keep their order in `df`."""
+    values = df[value].to_numpy().astype("float64")
+    if group is None:
+        return df.iloc[np.argsort(-values, kind="stable")[:k]]
+
+    codes, _ = dimension(df, group)
+    order = np.lexsort((-values, codes))
+    # Rank of each sorted row within its group
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    ranks = np.arange(len(order)) - np.repeat(
+        starts, np.diff(np.r_[starts, len(order)])
+    )
+    return df.iloc[order[ranks < k]]
+
+
+def attributes(df, level, columns) -> pd.DataFrame:
+    """Columns of `df` that are constant for each label of `level`, e.g. the
+    country name of each ISO2 code, indexed by the labels present in `df`."""
+    codes, labels = dimension(df, level)
+    present, first = np.unique(codes, return_index=True)
+    result = df[columns].iloc[first].reset_index(drop=True)
+    result.index = labels.take(present).rename(level)
+    return result
@@ -0,0 +1,206 @@
+import dash_bootstrap_components as dbc
+import dash_core_components as dcc
+import dash_html_components as html
+
+import spotify_dash.core.content as cnt
+import spotify_dash.core.views as views
+import spotify_dash.settings as sts
+
+TITLE = "SpotifySoundboard"
+EXTERNAL_STYLESHEETS = [dbc.themes.SOLAR]
+
+SECTION_STYLE = {"padding-left": 50, "padding-right": 50}
+
+
+def world_totals(world_view_df, derived_assets):
+    # Streams per country, artist and genre over the whole world view, if precomputed
+    world = derived_assets.get("world")
+    if world and world["world_view"] is world_view_df:
+        return world["totals"]
+    return None
+
+
+def render_country_profile(world_view_df, derived_assets):
+    return cnt.render_country_profile(
+        world_view_df,
+        views.country_view(
+            "United Kingdom",
+            sts.DASHBOARD_ASSET_PATH,
+            sts.GEOGRAPHY_DATA_PATH,
+            world_view_df=world_view_df,
+            totals=world_totals(world_view_df, derived_assets),
+        ),
+        views.similar_markets_view(
+            views.country_similarity_view(
+                world_view_df, derived_assets["artist_genres"]
+            ),
+            "United Kingdom",
+        ),
+    )
+
+
+# Dashboard sections in page order: id, container, style and a function rendering
+# the section's contents from the world view and the derived assets
+SECTIONS = [
+    (
+        "status",
+        dbc.Jumbotron,
+        {
+            "background": "linear-gradient("
+            "to right top, "
+            "rgb(253, 159, 108), "
+            "rgb(182, 54, 121) 30%, "
+            "rgb(59, 15, 111)"
+            ")",
+            "color": "rgb(240, 240, 240)",
+        },
+        lambda world_view_df, derived_assets: cnt.render_dashboard_status(
+            world_view_df,
+            depth=sts.DASHBOARD_CHART_DEPTH,
+            granularity=sts.DASHBOARD_GRANULARITY,
+        ),
+    ),
+    (
+        "date-range",
+        dbc.Jumbotron,
+        {
+            "padding-left": 50,
+            "padding-right": 50,
+            "padding-top": 25,
+            "padding-bottom": 25,
+        },
+        lambda world_view_df, derived_assets: cnt.render_date_range(
+            views.view_dates(world_view_df)
+        ),
+    ),
+    (
+        "world-map",
+        dbc.Jumbotron,
+        SECTION_STYLE,
+        lambda world_view_df, derived_assets: cnt.render_world_map(
+            views.choropleth_view(world_view_df, derived_assets["concentration"])
+        ),
+    ),
+    ("country-profile", dbc.Jumbotron, SECTION_STYLE, render_country_profile),
+    (
+        "artist-trends",
+        dbc.Jumbotron,
+        SECTION_STYLE,
+        lambda world_view_df, derived_assets: cnt.render_artists_trends(
+            views.artist_view(world_view_df), world_view_df
+        ),
+    ),
+    (
+        "similar-artists",
+        dbc.Jumbotron,
+        SECTION_STYLE,
+        lambda world_view_df, derived_assets: cnt.render_similar_artists(world_view_df),
+    ),
+    (
+        "track-charts",
+        dbc.Jumbotron,
+        SECTION_STYLE,
+        lambda world_view_df, derived_assets: cnt.render_track_charts(
+            world_view_df,
+            *views.track_charts_view(
+                derived_assets, "GB", depth=sts.DASHBOARD_CHART_DEPTH
+            ),
+        ),
+    ),
+    (
+        "chart-movement",
+        dbc.Jumbotron,
+        SECTION_STYLE,
+        lambda world_view_df, derived_assets: cnt.render_chart_movement(
+            world_view_df,
+            *views.chart_movement_view(
+                derived_assets, "GB", depth=sts.DASHBOARD_CHART_DEPTH
+            ),
+        ),
+    ),
+    (
+        "genre-space",
+        dbc.Jumbotron,
+        SECTION_STYLE,
+        lambda world_view_df, derived_assets: cnt.render_genre_space(),
+    ),
+    (
+        "genre-tree",
+        html.Div,
+        SECTION_STYLE,
+        lambda world_view_df, derived_assets: cnt.render_genre_tree(world_view_df),
+    ),
+]
+
+
+def section_renderers():
+    """Yield each section's name and the function rendering its contents from the
+    world view and the derived assets, which must include the GB track charts.
+    Callers only render, and load the data for, the sections they are missing."""
+    for name, _, _, render in SECTIONS:
+        yield name, render
+
+
+def build_layout(sections, failed=False):
+    """The dashboard, with a placeholder in each section missing from `sections`,
+    which the app fills in as they are rendered. The placeholders show an error
+    if the data `failed` to load."""
+    placeholder = cnt.render_load_error() if failed else cnt.render_loading_section()
+    children = [html.Br()]
+    for name, container, style, _ in SECTIONS:
+        children += [
+            html.Br(),
+            container(
+                id=f"{name}-section",
+                style=style,
+                children=sections.get(name, placeholder),
+            ),
+        ]
+    if len(sections) < len(SECTIONS):
+        children += [
+            dcc.Interval(id="loading-interval", interval=1000),
+            dcc.Store(id="loaded-sections", data=list(sections)),
+            dcc.Store(id="load-failed", data=failed),
+        ]
+
+    return html.Div(
+        children=[
+            # MAIN APP LAYOUT
+            dbc.Container(
+                style={
+                    "padding-left": "5%",
+                    "margin-left": "auto",
+                    "padding-right": "5%",
+                    "margin-right": "auto",
+                },
+                fluid=True,
+                children=children,
+            ),
+            html.Div(
+                style={
+                    "padding-top": 20,
+                    "padding-bottom": 15,
+                    "background": "#073642",
+                },
+                children=[
+                    dbc.Row(
+                        justify="start",
+                        no_gutters=True,
+                        children=[
+                            dbc.Col(
+                                width={"size": 1, "offset": 1},
+                                children=[
+                                    html.A(
+                                        "domvwt",
+                                        className="lead",
+                                        href="https://domvwt.github.io",
+                                        style={"color": cnt.SILVER},
+                                    )
+                                ],
+                            ),
+                        ],
+                    )
+                ],
+            ),
+        ],
+    )
@@ -0,0 +1,54 @@
+import importlib
+import json
+
+import plotly.utils
+
+
+def layout_to_dict(layout) -> dict:
+    # The same JSON that Dash serves from /_dash-layout
+    return json.loads(json.dumps(layout, cls=plotly.utils.PlotlyJSONEncoder))
+
+
+def layout_from_dict(node):
+    """Rebuild Dash components from their JSON form."""
+    if isinstance(node, list):
+        return [layout_from_dict(child) for child in node]
+    if is_component(node):
+        component = getattr(importlib.import_module(node["namespace"]), node["type"])
+        return component(
+            **{name: layout_from_dict(value) for name, value in node["props"].items()}
+        )
+    return node
+
+
+def is_component(node) -> bool:
+    return isinstance(node, dict) and {"type", "namespace", "props"} <= node.keys()
+
+
+def save_snapshot(layout_path, layout, versions):
+    """Export a layout as JSON, for the dashboard to serve while it loads the
+    assets with any of the given `versions`."""
+    with open(layout_path, "w") as f:
+        json.dump({"versions": list(versions), "layout": layout_to_dict(layout)}, f)
+
+
+def load_snapshot(layout_path, version):
+    """Return the snapshot layout if it was exported for `version`, else None."""
+    try:
+        with open(layout_path, "r") as f:
+            snapshot = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if version not in snapshot.get("versions", []):
+        print("Dashboard snapshot is out of date.")
+        return None
+    return layout_from_dict(snapshot["layout"])
+
+
+def layout_sections(layout, suffix):
+    """Children of the components in `layout` whose id ends with `suffix`, by name."""
+    return {
+        component.id[: -len(suffix)]: component.children
+        for component in layout._traverse()
+        if str(getattr(component, "id", "")).endswith(suffix)
+    }
@@ -1,75 +1,69 @@
+import numpy as np
 import pandas as pd
-from sklearn.decomposition import PCA
-from sklearn.manifold import TSNE
 
+from spotify_dash.core import engine
 from spotify_dash.utils import etl
 
 
-def world_view(spotify_asset_path, geographic_data_path) -> pd.DataFrame:
-    # IMPORTANT: Pandas has issues performing groupby operations on DataFrames containing categorical data.
-    # Categorical fields are explicitly converted to object type in the next step.
-
-    dtypes = {
-        "Position": "uint16",
-        "Track Name": "object",
-        "Artist": "object",
-        "Streams": "uint32",
-        "URL": "object",
-        "date": "datetime64[ns]",
-        "ISO2": "object",
-        "Genre": "object",
-    }
-
-    spotify_df_00 = etl.load_spotify_asset(spotify_asset_path).astype(dtypes)
-    spotify_df_01 = (
-        spotify_df_00.groupby(["ISO2", "date", "Artist", "Genre"])["Streams"]
-        .sum()
-        .to_frame()
-    )
-    country_info_00 = etl.load_country_info(geographic_data_path)
-    country_info_00.loc[:, "Continent"] = country_info_00.loc[:, "Continent"].map(
-        {
-            "AF": "Africa",
-            "AS": "Asia",
-            "NA": "North America",
-            "OC": "Asia",
-            "EU": "Europe",
-            "SA": "South America",
-        }
+def world_view(spotify_asset_path, geographic_data_path, depth=None) -> pd.DataFrame:
+    return etl.build_world_view(
+        etl.load_spotify_asset(spotify_asset_path),
+        etl.load_country_info(geographic_data_path),
+        depth=depth,
     )
-    world_view_df = spotify_df_01.join(country_info_00, how="inner")
 
-    # Drop incorrectly labelled Greenland streams...
-    world_view_df = world_view_df[world_view_df["Country"] != "Greenland"]
 
-    return world_view_df
+def view_dates(world_view_df) -> pd.DatetimeIndex:
+    return etl.view_dates(world_view_df)
+
+
+def date_range_view(world_view_df, start_date=None, end_date=None) -> pd.DataFrame:
+    # Binary search on the sorted date level rather than masking every row.
+    start, stop = world_view_df.index.slice_locs(start_date, end_date)
+    return world_view_df.iloc[start:stop]
 
 
 def country_view(
-    country_name, spotify_asset_path, geographic_data_path, world_view_df=None
+    country_name,
+    spotify_asset_path,
+    geographic_data_path,
+    world_view_df=None,
+    depth=None,
+    totals=None,
 ):
     country_name = "United Kingdom" if country_name is None else country_name
-    country_view_df = (
-        world_view(spotify_asset_path, geographic_data_path)
-        if world_view_df is None
-        else world_view_df
-    )
 
-    # Get streams by Artist
-    country_view_df = (
-        country_view_df.groupby(["Country", "Artist", "Genre"])["Streams"]
-        .sum()
-        .reset_index()
-    )
+    # Get streams by Artist, precomputed in `totals` for the whole world view
+    if totals is not None:
+        country_view_df = totals.droplevel("ISO2").reset_index()
+    else:
+        world_view_df = (
+            world_view(spotify_asset_path, geographic_data_path, depth=depth)
+            if world_view_df is None
+            else world_view_df
+        )
+        countries = engine.attributes(world_view_df, "ISO2", ["Country"])["Country"]
+        mask = (
+            engine.select(
+                world_view_df, "ISO2", countries.index[countries == country_name]
+            )
+            if country_name
+            else None
+        )
+        country_view_df = engine.group_sum(
+            world_view_df, ["ISO2", "Artist", "Genre"], mask=mask
+        )
+        iso2 = country_view_df.pop("ISO2")
+        country_view_df.insert(0, "Country", countries.reindex(iso2).to_numpy())
 
     # Filter for Country
     if country_name:
         country_view_df = country_view_df.loc[
             country_view_df.loc[:, "Country"] == country_name
-        ].reset_index()[:100]
+        ].reset_index()
 
-    # Sort records
-    country_view_df = country_view_df.sort_values(by="Streams", ascending=False)
+    # Sort records and keep the top 100 artists
+    country_view_df = country_view_df.sort_values(by="Streams", ascending=False)[:100]
 
     # Add position
     country_view_df["Position"] = range(1, len(country_view_df) + 1)
@@ -77,72 +71,80 @@ def country_view(
     return country_view_df
 
 
-def choropleth_view(world_view_df):
-    top_artists = (
-        world_view_df.copy()
-        .groupby(["Country"], group_keys=False)
-        .apply(lambda x: x.sort_values(by="Streams", ascending=False))
-        .reset_index()
-        .groupby(["Country"], group_keys=False)
-        .first()
-        .reset_index()
-        .loc[:, ["Country", "Artist"]]
-        .set_index("Country")
-    )
-
-    top_genres = (
-        world_view_df.copy()
-        .groupby(["Country", "Genre"], group_keys=False)[["Streams"]]
-        .sum()
-        .reset_index()
-        .groupby(["Country"], group_keys=False)
-        .apply(lambda x: x.sort_values(by="Streams", ascending=False))
-        .reset_index()
-        .groupby(["Country"], group_keys=False)
-        .first()
-        .reset_index()
-        .loc[:, ["Country", "Genre"]]
-        .set_index("Country")
-    )
-
-    total_streams = (
-        world_view_df.copy()
-        .groupby(["Country", "ISO3"])[["Streams"]]
-        .sum()
-        .reset_index()
-        .set_index("Country")
-    )
-
-    result = pd.concat([total_streams, top_artists, top_genres], axis=1).reset_index()
+def choropleth_view(world_view_df, concentration=None):
+    countries = engine.attributes(world_view_df, "ISO2", ["Country", "ISO3"])
+
+    # The artist with the most streams in any one week, and the genre with the
+    # most streams over all weeks
+    top_artists = engine.top_k(world_view_df, group="ISO2").index
+    top_genres = engine.top_k(
+        engine.group_sum(world_view_df, ["ISO2", "Genre"]), group="ISO2"
+    ).set_index("ISO2")["Genre"]
+    total_streams = engine.group_sum(world_view_df, ["ISO2"]).set_index("ISO2")
+
+    result = countries.assign(
+        Streams=total_streams["Streams"],
+        Artist=pd.Series(
+            top_artists.get_level_values("Artist"),
+            index=top_artists.get_level_values("ISO2"),
+        ),
+        Genre=top_genres,
+    )
+    result = result.reset_index().loc[
+        :, ["Country", "ISO2", "ISO3", "Streams", "Artist", "Genre"]
+    ]
+    result = result.sort_values("Country", kind="stable").reset_index(drop=True)
     result["ISO3"] = result["ISO3"].str.upper()
     result = result.rename(columns={"Artist": "Top Artist", "Genre": "Top Genre"})
 
+    # Precomputed weekly metrics, averaged over the same weeks
+    if concentration is not None:
+        dates = world_view_df.index.get_level_values("date")
+        result = result.join(
+            concentration_view(concentration, dates.min(), dates.max()), on="ISO2"
+        )
+
     return result
 
 
+def concentration_view(concentration, start_date=None, end_date=None):
+    # Weekly metrics are sorted by date, so the date range is a binary search.
+    dates = concentration["date"].values
+    start = 0 if start_date is None else dates.searchsorted(np.datetime64(start_date))
+    stop = (
+        len(dates)
+        if end_date is None
+        else dates.searchsorted(np.datetime64(end_date), side="right")
+    )
+    return (
+        concentration.iloc[start:stop]
+        .drop(columns="date")
+        .groupby("ISO2", sort=False)
+        .mean()
+    )
+
+
 def artist_view(
-    world_view_df, countries=None, artists=None, cumulative=False, rolling_avg=False
+    world_view_df,
+    countries=None,
+    artists=None,
+    cumulative=False,
+    rolling_avg=False,
+    rolling_window=4,
 ) -> pd.DataFrame:
-    data = world_view_df.copy().reset_index()
-
-    if countries:
-        data = data.loc[data.loc[:, "Country"].isin(countries), :]
+    mask = engine.select(world_view_df, "Country", countries) if countries else None
 
     # Get top 10 artists
     if artists is None:
-        artists = (
-            data.groupby("Artist", group_keys=False)["Streams"]
-            .sum()
-            .reset_index()
-            .sort_values(by="Streams", ascending=False)
-            .Artist.values[:10]
-        )
-
-    artist_view_df = (
-        data.loc[data.loc[:, "Artist"].isin(artists), :]
-        .groupby(["date", "Artist"])["Streams"]
-        .sum()
-        .reset_index()
+        artists = engine.top_k(
+            engine.group_sum(world_view_df, ["Artist"], mask=mask), k=10
+        )["Artist"].values
+
+    artist_mask = engine.select(world_view_df, "Artist", artists)
+    if mask is not None:
+        artist_mask &= mask
+    artist_view_df = engine.group_sum(
+        world_view_df, ["date", "Artist"], mask=artist_mask
     )
 
     if cumulative:
@@ -161,7 +163,7 @@ def artist_view(
             artist_view_df.groupby(["date", "Artist"])
             .sum()
             .unstack()
-            .rolling(4)
+            .rolling(rolling_window)
             .mean()
             .stack()
             .reset_index()
@@ -170,16 +172,266 @@ def artist_view(
     return artist_view_df
 
 
-def tsne_genre_view(
-    world_view_df, principal_components=14, perplexity=5, learning_rate=10, dims3d=False
+def track_chart_view(
+    track_charts, start_date=None, end_date=None, iso2=None, depth=None
+) -> pd.DataFrame:
+    # Chart entries are sorted by date, so the date range is a binary search.
+    dates = track_charts["date"].values
+    start = 0 if start_date is None else dates.searchsorted(np.datetime64(start_date))
+    stop = (
+        len(dates)
+        if end_date is None
+        else dates.searchsorted(np.datetime64(end_date), side="right")
+    )
+    charts = track_charts.iloc[start:stop]
+
+    keep = np.ones(len(charts), dtype=bool)
+    if iso2 is not None:
+        keep &= (charts["ISO2"] == iso2).to_numpy()
+    if depth is not None:
+        keep &= charts["Position"].to_numpy() <= depth
+
+    return charts.loc[keep]
+
+
+def top_tracks_view(
+    track_assets, iso2, start_date=None, end_date=None, depth=None, top=100
+) -> pd.DataFrame:
+    tracks = track_assets["tracks"]
+    charts = track_chart_view(
+        track_assets["track_charts"], start_date, end_date, iso2=iso2, depth=depth
+    )
+    codes = charts["Track"].to_numpy()
+    positions = charts["Position"].to_numpy()
+    dates = charts["date"].to_numpy()
+
+    # Totals per track code, indexed by the code itself
+    streams = np.bincount(
+        codes, weights=charts["Streams"].to_numpy(), minlength=len(tracks)
+    )
+    weeks = np.bincount(codes, minlength=len(tracks))
+    peak = np.full(len(tracks), np.iinfo("uint16").max, dtype="uint16")
+    np.minimum.at(peak, codes, positions)
+
+    # Rows are in date order, so first occurrences give the first and last weeks
+    charted, first = np.unique(codes, return_index=True)
+    _, last = np.unique(codes[::-1], return_index=True)
+    first_week = np.empty(len(tracks), dtype=dates.dtype)
+    last_week = np.empty(len(tracks), dtype=dates.dtype)
+    first_week[charted] = dates[first]
+    last_week[charted] = dates[len(dates) - 1 - last]
+
+    ranked = charted[np.argsort(-streams[charted], kind="stable")][:top]
+
+    top_tracks_df = tracks.iloc[ranked].reset_index(drop=True)
+    top_tracks_df["Track"] = ranked
+    top_tracks_df["Streams"] = streams[ranked].astype("uint64")
+    top_tracks_df["Weeks"] = weeks[ranked]
+    top_tracks_df["Peak"] = peak[ranked]
+    top_tracks_df["First Week"] = pd.to_datetime(first_week[ranked]).strftime(
+        "%Y-%m-%d"
+    )
+    top_tracks_df["Last Week"] = pd.to_datetime(last_week[ranked]).strftime("%Y-%m-%d")
+    top_tracks_df["Position"] = range(1, len(top_tracks_df) + 1)
+
+    return top_tracks_df
+
+
+def track_trends_view(
+    track_assets, track_codes, iso2=None, start_date=None, end_date=None, depth=None
+) -> pd.DataFrame:
+    tracks = track_assets["tracks"]
+    track_codes = np.asarray(track_codes, dtype="int32")
+
+    if iso2 is None and depth is None:
+        # Precomputed worldwide totals, sorted by track code
+        track_weeks = track_assets["track_weeks"]
+        starts = track_weeks["Track"].values.searchsorted(track_codes)
+        stops = track_weeks["Track"].values.searchsorted(track_codes, side="right")
+        blocks = [track_weeks.iloc[start:stop] for start, stop in zip(starts, stops)]
+        trends_df = pd.concat([track_weeks.iloc[:0], *blocks])
+        if start_date is not None:
+            trends_df = trends_df.loc[trends_df["date"] >= start_date]
+        if end_date is not None:
+            trends_df = trends_df.loc[trends_df["date"] <= end_date]
+    else:
+        charts = track_chart_view(
+            track_assets["track_charts"], start_date, end_date, iso2=iso2, depth=depth
+        )
+        trends_df = engine.group_sum(
+            charts,
+            ["Track", "date"],
+            mask=np.isin(charts["Track"].to_numpy(), track_codes),
+        )
+
+    # Track names are not unique, so label each line with its artist too
+    labels = tracks["Track Name"].astype(str) + " - " + tracks["Artist"].astype(str)
+    trends_df = trends_df.assign(Track=labels.to_numpy()[trends_df["Track"].to_numpy()])
+
+    return trends_df.loc[:, ["date", "Track", "Streams"]].reset_index(drop=True)
+
+
+def track_charts_view(
+    track_assets, iso2, start_date=None, end_date=None, depth=None, top_n=5
 ):
-    genre_df = (
-        world_view_df.groupby(["Country", "Continent", "ISO2", "Genre"])["Streams"]
-        .sum()
-        .unstack()
-        .fillna(0)
+    """The top tracks of a country, and the streams of its first `top_n` by week."""
+    top_tracks = top_tracks_view(track_assets, iso2, start_date, end_date, depth=depth)
+    track_trends = track_trends_view(
+        track_assets,
+        top_tracks["Track"][:top_n],
+        iso2=iso2,
+        start_date=start_date,
+        end_date=end_date,
+        depth=depth,
     )
-    genre_df = genre_df.divide(genre_df.sum(axis=1), axis=0)
+    return top_tracks, track_trends
+
+
+def chart_movement_view(track_assets, iso2, week=None, depth=None, top=10):
+    track_charts = track_assets["track_charts"]
+
+    # Use the latest chart week on or before the requested week
+    dates = track_charts["date"].values
+    if week is not None:
+        dates = dates[: dates.searchsorted(np.datetime64(week), side="right")]
+    if len(dates):
+        week = dates[-1]
+
+    # Movements are counted on the chart at the depth shown, so a track moving up
+    # from below it is a new entry or a re-entry
+    history = etl.add_chart_movements(
+        track_chart_view(track_charts, end_date=week, iso2=iso2, depth=depth)
+    )
+    week_df = track_chart_view(history, week, week).join(
+        track_assets["tracks"].loc[:, ["Track Name", "Artist"]], on="Track"
+    )
+    last_position = week_df["Last Position"].astype("int32")
+    week_df["Change"] = (last_position - week_df["Position"]).where(
+        last_position > 0, 0
+    )
+
+    new_entries = week_df.loc[week_df["Weeks On Chart"] == 1]
+    climbers = week_df.loc[week_df["Change"] > 0].sort_values(
+        ["Change", "Position"], ascending=[False, True]
+    )
+    longest_running = week_df.sort_values(
+        ["Weeks On Chart", "Position"], ascending=[False, True]
+    )
+
+    return new_entries[:top], climbers[:top], longest_running[:top]
+
+
+def similar_artists_view(similar_artists, artist, top=10) -> pd.DataFrame:
+    artists, vectors = similar_artists["artists"], similar_artists["vectors"]
+    artist_code = artists.get_indexer([artist])[0]
+    top = min(top, len(artists) - 1)
+    if artist_code < 0 or top < 1:
+        return pd.DataFrame(columns=["Artist", "Similarity"])
+
+    # Cosine similarity of unit vectors, excluding the artist itself
+    similarity = vectors @ vectors[artist_code]
+    similarity[artist_code] = -np.inf
+    nearest = np.argpartition(-similarity, top - 1)[:top]
+    nearest = nearest[np.argsort(-similarity[nearest], kind="stable")]
+
+    return pd.DataFrame(
+        {
+            "Artist": artists[nearest],
+            "Similarity": similarity[nearest].astype("float64").round(3),
+        }
+    )
+
+
+def genre_profile_view(world_view_df, artist_genres=None):
+    # Imported here so scipy is only loaded when profiles are built
+    from scipy import sparse
+
+    # Without multi-genre weights, each artist counts towards its prime genre only
+    if artist_genres is None:
+        artist_genres = etl.build_artist_genre_weights(
+            world_view_df.index.to_frame(index=False)
+        )
+
+    country_codes, countries = pd.factorize(
+        world_view_df.index.get_level_values("ISO2")
+    )
+    artist_codes = artist_genres["artists"].get_indexer(
+        world_view_df.index.get_level_values("Artist")
+    )
+    known = artist_codes >= 0
+
+    # Country x artist streams; duplicate entries are summed on conversion
+    country_artist = sparse.csr_matrix(
+        (
+            world_view_df["Streams"].to_numpy(dtype="float64")[known],
+            (country_codes[known], artist_codes[known]),
+        ),
+        shape=(len(countries), len(artist_genres["artists"])),
+    )
+    profiles = country_artist @ artist_genres["weights"]
+
+    # Share of each country's streams by genre
+    totals = np.asarray(profiles.sum(axis=1)).ravel()
+    profiles = sparse.diags(1 / np.where(totals > 0, totals, 1)) @ profiles
+
+    _, first_rows = np.unique(country_codes, return_index=True)
+    country_index = pd.MultiIndex.from_arrays(
+        [
+            world_view_df["Country"].to_numpy()[first_rows],
+            world_view_df["Continent"].to_numpy()[first_rows],
+            countries,
+        ],
+        names=["Country", "Continent", "ISO2"],
+    )
+
+    return country_index, artist_genres["genres"], profiles.tocsr()
+
+
+def country_similarity_view(world_view_df, artist_genres=None, top=5):
+    # Cosine similarity between every pair of country genre profiles in one
+    # matrix product, keeping each country's top matches.
+    country_index, _, profiles = genre_profile_view(world_view_df, artist_genres)
+    norms = np.sqrt(np.asarray(profiles.multiply(profiles).sum(axis=1)).ravel())
+    unit_profiles = profiles.multiply(1 / np.where(norms > 0, norms, 1)[:, None])
+    similarity = (unit_profiles @ unit_profiles.T).toarray()
+    np.fill_diagonal(similarity, -np.inf)
+
+    top = min(top, len(country_index) - 1)
+    neighbours = np.argsort(-similarity, axis=1, kind="stable")[:, :top]
+    countries = country_index.get_level_values("Country")
+
+    return pd.DataFrame(
+        {
+            "Country": np.repeat(countries, top),
+            "Similar Market": countries[neighbours.ravel()],
+            "Similarity": np.take_along_axis(similarity, neighbours, axis=1)
+            .ravel()
+            .round(3),
+        }
+    ).set_index("Country")
+
+
+def similar_markets_view(country_similarity, country_name) -> pd.DataFrame:
+    country_name = "United Kingdom" if country_name is None else country_name
+    if country_name not in country_similarity.index:
+        return country_similarity.iloc[:0].reset_index(drop=True)
+    return country_similarity.loc[[country_name]].reset_index(drop=True)
+
+
+def tsne_genre_view(
+    world_view_df,
+    principal_components=14,
+    perplexity=5,
+    learning_rate=10,
+    dims3d=False,
+    artist_genres=None,
+):
+    # scikit-learn is slow to import and only needed here, so keep it off startup.
+    from sklearn.decomposition import PCA
+    from sklearn.manifold import TSNE
+
+    country_index, _, profiles = genre_profile_view(world_view_df, artist_genres)
+    genre_df = pd.DataFrame(profiles.toarray(), index=country_index)
 
     dims = 3 if dims3d else 2
 
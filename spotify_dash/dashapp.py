@@ -1,21 +1,30 @@
+import functools
 import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
 import dash
-import dash_bootstrap_components as dbc
-import dash_html_components as html
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
+from flask import abort
 from flask_caching import Cache
 
-from spotify_dash.core import charts
 import spotify_dash.core.content as cnt
 import spotify_dash.core.views as views
 import spotify_dash.jobs.download_data as dld
 import spotify_dash.settings as sts
+import spotify_dash.utils.etl as etl
+import spotify_dash.utils.io as iou
+from spotify_dash.core import api, charts, layout, snapshot
+from spotify_dash.utils.dates import PERIOD_DAYS
 
 
 print("Starting Dashboard application.")
 
 app = dash.Dash(
-    __name__, external_stylesheets=[dbc.themes.SOLAR], title="SpotifySoundboard"
+    __name__, external_stylesheets=layout.EXTERNAL_STYLESHEETS, title=layout.TITLE
 )
 
 cache = Cache(
@@ -25,169 +34,464 @@ cache = Cache(
 server = app.server
 
 TIMEOUT = 1800  # In seconds; 1800s = 30 minutes
+LOAD_TIMEOUT = 10  # In seconds; how long API requests wait for the data to load
 
-dld.download_spotify_asset()
+# Rendered contents of each dashboard section, filled in by load_dashboard
+RENDERED_SECTIONS = {}
+data_loading = threading.Event()
+data_ready = threading.Event()
+load_failed = threading.Event()
 
 
-@cache.memoize(timeout=TIMEOUT)
-def cached_world_view():
-    return views.world_view(sts.SPOTIFY_ASSET_PATH, sts.GEOGRAPHY_DATA_PATH)
+def derived_asset_path():
+    # Regional replicas load the global rollup, and each country's track charts on demand
+    if sts.COUNTRY_PARTITIONS:
+        return sts.SPOTIFY_ROLLUP_PATH
+    return sts.SPOTIFY_DERIVED_ASSET_PATH
+
+
+def download_assets():
+    # The chart asset itself is only downloaded if the world view is built from it
+    dld.download_spotify_asset(derived_asset_path())
+    dld.download_spotify_asset(sts.SNAPSHOT_LAYOUT_PATH)
+
+
+# Held in process memory rather than the filesystem cache: when gunicorn preloads the
+# app (see gunicorn_config.py) it is built once in the master and shared by the workers.
+@functools.lru_cache(maxsize=None)
+def cached_world_view(depth=sts.DASHBOARD_CHART_DEPTH):
+    # The ETL job keeps the weekly world view up to date in the derived asset
+    world = cached_derived_assets().get("world")
+    if sts.DASHBOARD_GRANULARITY == "weekly" and world and world["depth"] == depth:
+        return world["world_view"]
+    dld.download_spotify_asset(sts.DASHBOARD_ASSET_PATH)
+    return views.world_view(
+        sts.DASHBOARD_ASSET_PATH, sts.GEOGRAPHY_DATA_PATH, depth=depth
+    )
+
+
+def ranged_world_view(date_range=None):
+    # The date range slider holds positions in the sorted chart dates
+    world_view_df = cached_world_view()
+    dates = views.view_dates(world_view_df)
+    if not date_range or list(date_range) == [0, len(dates) - 1]:
+        return world_view_df
+    return views.date_range_view(
+        world_view_df, dates[date_range[0]], dates[date_range[1]]
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def cached_derived_assets():
+    return etl.load_derived_assets(derived_asset_path())
+
+
+@functools.lru_cache(maxsize=None)
+def asset_version():
+    return iou.file_digest(derived_asset_path())
+
+
+@functools.lru_cache(maxsize=sts.COUNTRY_PARTITION_CACHE_SIZE)
+def cached_country_partition(iso2):
+    file_path = etl.country_partition_path(sts.SPOTIFY_COUNTRY_DIR, iso2)
+    dld.download_spotify_asset(
+        file_path, object_name=etl.country_partition_object_name(iso2)
+    )
+    return etl.load_derived_assets(file_path)
+
+
+@functools.lru_cache(maxsize=None)
+def chart_countries():
+    return frozenset(cached_world_view().index.get_level_values("ISO2").unique())
+
+
+def track_assets(iso2):
+    # The derived track tables, with the country's track charts when partitioned.
+    # The code is part of the partition's path, so only chart countries are loaded,
+    # and others get the rollup's empty track charts.
+    if sts.COUNTRY_PARTITIONS and iso2 in chart_countries():
+        return dict(cached_derived_assets(), **cached_country_partition(iso2))
+    return cached_derived_assets()
+
+
+def world_totals():
+    return layout.world_totals(cached_world_view(), cached_derived_assets())
+
+
+# Computed once per asset version, over all of its weeks
+@functools.lru_cache(maxsize=None)
+def cached_country_similarity():
+    return views.country_similarity_view(
+        cached_world_view(), cached_derived_assets()["artist_genres"]
+    )
+
+
+def track_views(iso2, date_range=None, top_n=5):
+    dates = views.view_dates(cached_world_view())
+    start_date, end_date = (
+        (dates[date_range[0]], dates[date_range[1]]) if date_range else (None, None)
+    )
+    return views.track_charts_view(
+        track_assets(iso2),
+        iso2,
+        start_date,
+        end_date,
+        depth=sts.DASHBOARD_CHART_DEPTH,
+        top_n=top_n,
+    )
+
+
+def movement_views(iso2, date_range=None):
+    # Chart movement is shown for the last week of the selected range
+    dates = views.view_dates(cached_world_view())
+    return views.chart_movement_view(
+        track_assets(iso2),
+        iso2,
+        week=dates[date_range[1]] if date_range else None,
+        depth=sts.DASHBOARD_CHART_DEPTH,
+    )
 
 
 @cache.memoize(timeout=TIMEOUT)
-def cached_country_view(country_name):
+def cached_country_view(country_name, date_range=None):
+    world_view_df = ranged_world_view(date_range)
     return views.country_view(
         country_name,
-        sts.SPOTIFY_ASSET_PATH,
+        sts.DASHBOARD_ASSET_PATH,
         sts.GEOGRAPHY_DATA_PATH,
-        world_view_df=cached_world_view(),
+        world_view_df=world_view_df,
+        totals=world_totals() if world_view_df is cached_world_view() else None,
+    )
+
+
+@cache.memoize(timeout=TIMEOUT)
+def cached_choropleth(colour, date_range=None):
+    return charts.world_choropleth(
+        chart_data=views.choropleth_view(
+            ranged_world_view(date_range), cached_derived_assets()["concentration"]
+        ),
+        colour=colour,
     )
 
 
-app.layout = html.Div(
-    children=[
-        # MAIN APP LAYOUT
-        dbc.Container(
-            style={
-                "padding-left": "5%",
-                "margin-left": "auto",
-                "padding-right": "5%",
-                "margin-right": "auto",
-            },
-            fluid=True,
-            children=[
-                html.Br(),
-                html.Br(),
-                dbc.Jumbotron(
-                    style={
-                        "background": "linear-gradient("
-                        "to right top, "
-                        "rgb(253, 159, 108), "
-                        "rgb(182, 54, 121) 30%, "
-                        "rgb(59, 15, 111)"
-                        ")",
-                        "color": "rgb(240, 240, 240)",
-                    },
-                    children=[*cnt.render_dashboard_status(cached_world_view())],
-                ),
-                html.Br(),
-                dbc.Jumbotron(
-                    style={"padding-left": 50, "padding-right": 50},
-                    children=[
-                        *cnt.render_world_map(
-                            views.choropleth_view(cached_world_view())
-                        )
-                    ],
-                ),
-                html.Br(),
-                dbc.Jumbotron(
-                    style={"padding-left": 50, "padding-right": 50},
-                    children=[
-                        *cnt.render_country_profile(
-                            cached_world_view(),
-                            cached_country_view(country_name="United Kingdom"),
-                        )
-                    ],
-                ),
-                html.Br(),
-                dbc.Jumbotron(
-                    style={"padding-left": 50, "padding-right": 50},
-                    children=[
-                        *cnt.render_artists_trends(
-                            views.artist_view(cached_world_view()), cached_world_view()
-                        )
-                    ],
-                ),
-                html.Br(),
-                dbc.Jumbotron(
-                    style={"padding-left": 50, "padding-right": 50},
-                    children=[*cnt.render_genre_space(cached_world_view())],
-                ),
-                html.Br(),
-                html.Div(
-                    style={"padding-left": 50, "padding-right": 50},
-                    children=[*cnt.render_genre_tree(cached_world_view(),)],
-                ),
-            ],
+@cache.memoize(timeout=TIMEOUT)
+def cached_artist_trends(date_option, axis_option, artists, date_range=None):
+    return charts.artist_trends(
+        chart_data=views.artist_view(
+            ranged_world_view(date_range),
+            cumulative="cumulative" in date_option,
+            rolling_avg="rolling-avg" in axis_option,
+            rolling_window=4 * 7 // PERIOD_DAYS[sts.DASHBOARD_GRANULARITY],
+            artists=artists,
         ),
-        html.Div(
-            style={"padding-top": 20, "padding-bottom": 15, "background": "#073642"},
-            children=[
-                dbc.Row(
-                    justify="start",
-                    no_gutters=True,
-                    children=[
-                        dbc.Col(
-                            width={"size": 1, "offset": 1},
-                            children=[
-                                html.A(
-                                    "domvwt",
-                                    className="lead",
-                                    href="https://domvwt.github.io",
-                                    style={"color": cnt.SILVER},
-                                )
-                            ],
-                        ),
-                    ],
-                )
-            ],
+    )
+
+
+# Keyed by the asset version, as the filesystem cache outlives asset updates, and by
+# the regenerate button's clicks, which ask for a new embedding
+# noinspection PyUnusedLocal
+@cache.memoize(timeout=TIMEOUT)
+def cached_country_clustering(
+    version, tsne_3d, tsne_pca, tsne_perplexity, regen, date_range=None
+):
+    return charts.country_tsne_clustering(
+        chart_data=views.tsne_genre_view(
+            world_view_df=ranged_world_view(date_range),
+            principal_components=tsne_pca,
+            dims3d=tsne_3d,
+            perplexity=tsne_perplexity,
+            artist_genres=cached_derived_assets()["artist_genres"],
         ),
+        plot3d=tsne_3d,
+    )
+
+
+def warm_caches(threads=sts.CACHE_WARMUP_THREADS):
+    """Fill the view caches with the inputs the dashboard offers by default, so
+    that the first visitors do not pay for them."""
+    started = time.perf_counter()
+    world_view_df = cached_world_view()
+    # The date range slider starts on the full range
+    date_range = [0, len(views.view_dates(world_view_df)) - 1]
+    artists = cnt.default_artists(views.artist_view(world_view_df))
+
+    tasks = [
+        functools.partial(cached_country_view, country, date_range)
+        for country in sorted(world_view_df["Country"].unique())
+    ]
+    tasks += [
+        functools.partial(cached_choropleth, option["value"], date_range)
+        for option in cnt.CHOROPLETH_COLOUR_OPTIONS
+    ]
+    tasks += [
+        functools.partial(
+            cached_artist_trends, date_option, axis_option, artists, date_range
+        )
+        for date_option in ["snapshot", "cumulative"]
+        for axis_option in [[], ["rolling-avg"]]
+    ]
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for future in [pool.submit(task) for task in tasks]:
+            future.result()
+    print(f"Warmed {len(tasks)} cached views in {time.perf_counter() - started:.1f}s.")
+
+
+# Read-only JSON API for downstream consumers, served from an index built with the
+# world view, so that workers forked after the load share it
+@functools.lru_cache(maxsize=None)
+def cached_api_index():
+    return api.ApiIndex(cached_world_view())
+
+
+def loaded_api_index():
+    # Wait for the background load rather than loading a second copy. Processes
+    # that are not loading the data, such as gunicorn workers forked before the
+    # master loaded it, answer at once.
+    if not data_ready.is_set() and not (
+        data_loading.is_set() and data_ready.wait(timeout=LOAD_TIMEOUT)
+    ):
+        abort(503, "The dashboard data is not loaded yet.")
+    return cached_api_index()
+
+
+server.register_blueprint(api.create_blueprint(loaded_api_index))
+
+
+def render_dashboard():
+    """Download and load the data, then render the dashboard's sections."""
+    started = time.perf_counter()
+    download_assets()
+
+    # The snapshot exported by the ETL job is served as soon as it is found to
+    # match the derived asset, before that is loaded. Only weekly views are exported.
+    if sts.DASHBOARD_GRANULARITY == "weekly":
+        snapshot_layout = snapshot.load_snapshot(
+            sts.SNAPSHOT_LAYOUT_PATH, asset_version()
+        )
+        if snapshot_layout is not None:
+            RENDERED_SECTIONS.update(
+                snapshot.layout_sections(snapshot_layout, "-section")
+            )
+
+    # The data is loaded in any case, to be shared by the callbacks and the workers,
+    # but only the sections missing from the snapshot are rendered in-process
+    world_view_df = cached_world_view()
+    for name, render in layout.section_renderers():
+        if name not in RENDERED_SECTIONS:
+            RENDERED_SECTIONS[name] = render(world_view_df, track_assets("GB"))
+    cached_api_index()
+    print(f"Dashboard loaded in {time.perf_counter() - started:.1f}s.")
+
+
+def load_dashboard(retry_seconds=sts.LOAD_RETRY_SECONDS):
+    """Render the dashboard, retrying every `retry_seconds` while it fails to load,
+    or raising the error if it is None. Meanwhile the shell shows the failure."""
+    data_loading.set()
+    while True:
+        try:
+            render_dashboard()
+            break
+        except Exception:
+            load_failed.set()
+            traceback.print_exc()
+            if retry_seconds is None:
+                raise
+            print(f"Dashboard failed to load, retrying in {retry_seconds}s.")
+            time.sleep(retry_seconds)
+    load_failed.clear()
+    data_ready.set()
+
+
+def load_in_background():
+    # Runs on its own thread, so the warm-up follows the load without blocking anything
+    load_dashboard()
+    if sts.CACHE_WARMUP:
+        warm_caches()
+
+
+@functools.lru_cache(maxsize=1)
+def loaded_layout():
+    return layout.build_layout(RENDERED_SECTIONS)
+
+
+def serve_layout():
+    # Until the data has loaded, visitors get a shell that fills in section by section
+    if data_ready.is_set():
+        return loaded_layout()
+    return layout.build_layout(dict(RENDERED_SECTIONS), failed=load_failed.is_set())
+
+
+# The shell does not yet contain the inputs of most callbacks
+app.config.suppress_callback_exceptions = True
+app.layout = serve_layout
+
+
+@app.callback(
+    [
+        *[
+            Output(component_id=f"{name}-section", component_property="children")
+            for name, _, _, _ in layout.SECTIONS
+        ],
+        Output(component_id="loaded-sections", component_property="data"),
+        Output(component_id="load-failed", component_property="data"),
+        Output(component_id="loading-interval", component_property="disabled"),
+    ],
+    [Input(component_id="loading-interval", component_property="n_intervals")],
+    [
+        State(component_id="loaded-sections", component_property="data"),
+        State(component_id="load-failed", component_property="data"),
     ],
 )
+def fill_sections(n_intervals, loaded, failed):
+    rendered = dict(RENDERED_SECTIONS)
+    failing = load_failed.is_set()
+    if set(rendered) == set(loaded) and failing == failed:
+        raise PreventUpdate
+    # Sections still to come show the failure, or loading again on a retry
+    placeholder = cnt.render_load_error() if failing else cnt.render_loading_section()
+    children = [
+        rendered[name]
+        if name in rendered and name not in loaded
+        else placeholder
+        if name not in rendered and failing != failed
+        else dash.no_update
+        for name, _, _, _ in layout.SECTIONS
+    ]
+    return children + [
+        list(rendered),
+        failing,
+        len(rendered) == len(layout.SECTIONS),
+    ]
 
 
+# Figures are built on the server and stored; presentation-only options such as
+# the map scope and log axis are applied in the browser (assets/clientside.js).
 @app.callback(
+    Output(component_id="world-choropleth-store", component_property="data"),
+    [
+        Input(component_id="choropleth-colour", component_property="value"),
+        Input(component_id="date-range", component_property="value"),
+    ],
+)
+def update_stream_atlas(colour, date_range):
+    return cached_choropleth(colour, date_range)
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace="figures", function_name="setGeoScope"),
     Output(component_id="world-choropleth", component_property="figure"),
-    [Input(component_id="choropleth-input", component_property="value")],
+    [
+        Input(component_id="world-choropleth-store", component_property="data"),
+        Input(component_id="choropleth-input", component_property="value"),
+    ],
 )
-def update_stream_atlas(input_value):
-    return charts.world_choropleth(
-        chart_data=views.choropleth_view(cached_world_view()), scope=input_value
-    )
 
 
 @app.callback(
     Output(component_id="country-sunburst", component_property="figure"),
-    [Input(component_id="country-input", component_property="value")],
+    [
+        Input(component_id="country-input", component_property="value"),
+        Input(component_id="date-range", component_property="value"),
+    ],
 )
-def update_country_sunburst(input_value):
-    return charts.country_sunburst(chart_data=cached_country_view(input_value))
+def update_country_sunburst(input_value, date_range):
+    return charts.country_sunburst(
+        chart_data=cached_country_view(input_value, date_range)
+    )
 
 
 @app.callback(
     Output(component_id="country-table", component_property="data"),
+    [
+        Input(component_id="country-input", component_property="value"),
+        Input(component_id="date-range", component_property="value"),
+    ],
+)
+def update_country_table(input_value, date_range):
+    return cached_country_view(input_value, date_range).to_dict("records")
+
+
+@app.callback(
+    Output(component_id="similar-markets-table", component_property="data"),
     [Input(component_id="country-input", component_property="value")],
 )
-def update_country_table(input_value):
-    return cached_country_view(input_value).to_dict("records")
+def update_similar_markets(input_value):
+    return views.similar_markets_view(cached_country_similarity(), input_value).to_dict(
+        "records"
+    )
 
 
 @app.callback(
-    Output(component_id="artist-trends", component_property="figure"),
+    Output(component_id="artist-trends-store", component_property="data"),
     [
         Input(component_id="artist-trends-date-options", component_property="value"),
         Input(component_id="artist-trends-axis-options", component_property="value"),
         Input(component_id="artist-trends-selection", component_property="value"),
+        Input(component_id="date-range", component_property="value"),
     ],
 )
-def update_artist_trends(date_option, axis_option, artists):
-    log = True if "log-y" in axis_option else False
-    rolling = True if "rolling-avg" in axis_option else False
+def update_artist_trends(date_option, axis_option, artists, date_range):
+    return cached_artist_trends(date_option, axis_option, artists, date_range)
 
-    cumulative = True if "cumulative" in date_option else False
 
-    return charts.artist_trends(
-        chart_data=views.artist_view(
-            cached_world_view(),
-            cumulative=cumulative,
-            rolling_avg=rolling,
-            artists=artists,
-        ),
-        log=log,
+app.clientside_callback(
+    ClientsideFunction(namespace="figures", function_name="setLogAxis"),
+    Output(component_id="artist-trends", component_property="figure"),
+    [
+        Input(component_id="artist-trends-store", component_property="data"),
+        Input(component_id="artist-trends-log-y", component_property="value"),
+    ],
+)
+
+
+@app.callback(
+    Output(component_id="similar-artists-table", component_property="data"),
+    [Input(component_id="similar-artists-input", component_property="value")],
+)
+def update_similar_artists(artist):
+    return views.similar_artists_view(
+        cached_derived_assets()["similar_artists"], artist
+    ).to_dict("records")
+
+
+@app.callback(
+    [
+        Output(component_id="track-table", component_property="data"),
+        Output(component_id="track-trends", component_property="figure"),
+    ],
+    [
+        Input(component_id="track-country-input", component_property="value"),
+        Input(component_id="date-range", component_property="value"),
+    ],
+)
+def update_track_charts(iso2, date_range):
+    top_tracks, track_trends = track_views(iso2, date_range)
+    return (
+        top_tracks.to_dict("records"),
+        charts.artist_trends(track_trends, color="Track"),
     )
 
 
-# noinspection PyUnusedLocal
+@app.callback(
+    [
+        Output(component_id=table_id, component_property="data")
+        for table_id in cnt.MOVEMENT_TABLE_COLUMNS
+    ],
+    [
+        Input(component_id="movement-country-input", component_property="value"),
+        Input(component_id="date-range", component_property="value"),
+    ],
+)
+def update_chart_movement(iso2, date_range):
+    return [
+        movement.loc[:, columns].to_dict("records")
+        for movement, columns in zip(
+            movement_views(iso2, date_range), cnt.MOVEMENT_TABLE_COLUMNS.values()
+        )
+    ]
+
+
 @app.callback(
     Output(component_id="country-clustering", component_property="figure"),
     [
@@ -195,20 +499,29 @@ def update_artist_trends(date_option, axis_option, artists):
         Input(component_id="tsne-pca", component_property="value"),
         Input(component_id="tsne-perplexity", component_property="value"),
         Input(component_id="tsne-regenerate", component_property="n_clicks"),
+        Input(component_id="date-range", component_property="value"),
     ],
 )
-def update_country_clustering(tsne_3d, tsne_pca, tsne_perplexity, regen):
-    return charts.country_tsne_clustering(
-        chart_data=views.tsne_genre_view(
-            world_view_df=cached_world_view(),
-            principal_components=tsne_pca,
-            dims3d=tsne_3d,
-            perplexity=tsne_perplexity,
-        ),
-        plot3d=tsne_3d,
+def update_country_clustering(tsne_3d, tsne_pca, tsne_perplexity, regen, date_range):
+    return cached_country_clustering(
+        asset_version(), tsne_3d, tsne_pca, tsne_perplexity, regen, date_range
     )
 
 
+@app.callback(
+    Output(component_id="genre-tree", component_property="figure"),
+    [Input(component_id="date-range", component_property="value")],
+)
+def update_genre_tree(date_range):
+    return charts.genre_tree(ranged_world_view(date_range))
+
+
+# The server answers with the shell while the data loads in the background. Under
+# gunicorn the master loads it instead (see gunicorn_config.py).
+if sts.BACKGROUND_LOADING or __name__ == "__main__":
+    threading.Thread(target=load_in_background, daemon=True).start()
+
+
 if __name__ == "__main__":
     debug = True if "--debug" in sys.argv else False
     app.run_server(debug=debug)
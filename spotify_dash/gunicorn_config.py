@@ -0,0 +1,57 @@
+import gc
+import os
+import signal
+import threading
+import time
+
+# Import the app in the master process, without loading any data, so that the first
+# workers start at once and serve the dashboard's loading shell. The master then
+# downloads the asset and builds the world view once, and replaces the workers with
+# ones forked from it, which share that memory copy-on-write.
+# Settings are only imported by the hooks, after raw_env is applied.
+preload_app = True
+raw_env = ["BACKGROUND_LOADING=false"]
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+
+
+def when_ready(server):
+    threading.Thread(target=load_dashboard, args=(server,), daemon=True).start()
+
+
+def load_dashboard(server):
+    import spotify_dash.dashapp as dashapp
+
+    # Only load once the first workers are forked, so no fork copies a running thread
+    while len(server.WORKERS) < server.num_workers:
+        time.sleep(0.1)
+    try:
+        dashapp.load_dashboard(retry_seconds=None)
+    except Exception:
+        # Stop the workers and exit, so that the supervisor restarts the server
+        for pid in list(server.WORKERS):
+            os.kill(pid, signal.SIGTERM)
+        os._exit(1)
+    # A reload forks new workers from the master and stops the old ones gracefully
+    os.kill(server.pid, signal.SIGHUP)
+
+
+def pre_fork(server, worker):
+    import spotify_dash.dashapp as dashapp
+
+    # Move preloaded objects out of the collector's reach so that garbage
+    # collection in the workers does not touch (and copy) the shared pages.
+    gc.freeze()
+    # The first worker forked with the data loaded warms the view caches, which
+    # the workers share through the filesystem
+    warmed = getattr(server, "caches_warmed", False)
+    worker.warms_caches = dashapp.data_ready.is_set() and not warmed
+    server.caches_warmed = warmed or worker.warms_caches
+
+
+def post_fork(server, worker):
+    import spotify_dash.dashapp as dashapp
+    import spotify_dash.settings as sts
+
+    if worker.warms_caches and sts.CACHE_WARMUP:
+        threading.Thread(target=dashapp.warm_caches, daemon=True).start()
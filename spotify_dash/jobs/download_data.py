@@ -1,15 +1,29 @@
 import spotify_dash.settings as sts
-import spotify_dash.utils.s3 as s3u
 
 
+import fcntl
 from datetime import datetime
 from pathlib import Path
 
 
-def download_spotify_asset():
+def download_spotify_asset(asset_path=sts.DASHBOARD_ASSET_PATH, object_name=None):
+    asset_path = Path(asset_path)
+    asset_path.parent.mkdir(parents=True, exist_ok=True)
+    lock_path = asset_path.with_name(asset_path.name + ".lock")
+
+    # Only one process downloads at a time; the others wait for the lock and
+    # then find a fresh asset on disk.
+    with open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            _download_if_stale(asset_path, object_name or asset_path.name)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _download_if_stale(asset_path, object_name):
     # Download s3 resources
     dl_required = False
-    asset_path = Path(sts.SPOTIFY_ASSET_PATH)
 
     if asset_path.is_file():
         last_update = datetime.fromtimestamp(asset_path.stat().st_ctime)
@@ -21,9 +35,19 @@ def download_spotify_asset():
         dl_required = True
 
     if dl_required:
-        spotify_s3 = s3u.BucketObjectConn(object_name=sts.SPOTIFY_ASSET_PATH.name)
-        spotify_s3.download(sts.SPOTIFY_ASSET_PATH)
+        # Imported here so boto3 is only loaded when a download is needed
+        import spotify_dash.utils.s3 as s3u
+
+        # Write to a temporary file so readers never see a partial asset
+        partial_path = asset_path.with_name(asset_path.name + ".part")
+        spotify_s3 = s3u.BucketObjectConn(object_name=object_name)
+        if spotify_s3.download(partial_path):
+            partial_path.replace(asset_path)
 
 
 if __name__ == "__main__":
     download_spotify_asset()
+    download_spotify_asset(sts.SPOTIFY_DERIVED_ASSET_PATH)
+    download_spotify_asset(sts.SNAPSHOT_LAYOUT_PATH)
+    if sts.COUNTRY_PARTITIONS:
+        download_spotify_asset(sts.SPOTIFY_ROLLUP_PATH)
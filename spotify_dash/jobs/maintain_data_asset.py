@@ -1,18 +1,39 @@
 import asyncio
 import datetime as dt
 import shutil
-
-import pandas as pd
+import sys
+import traceback
 
 import spotify_dash.settings as sts
 import spotify_dash.utils.etl as etl
 import spotify_dash.utils.io as iou
 import spotify_dash.utils.s3 as s3u
-from spotify_dash.utils.dates import get_last_friday_from
+from spotify_dash.core import layout, snapshot
+from spotify_dash.utils.dates import generate_dates, get_last_friday_from
+from spotify_dash.utils.report import RunReport
 from spotify_dash.utils.spotify import SpotifyDownloader
 
 
-def main(mode="update"):
+def main(mode="update", start_date=None, end_date=None):
+    report = RunReport(mode)
+    success = False
+    try:
+        success = update_assets(mode, start_date, end_date, report)
+        return success
+    finally:
+        # Uploaded even if the run fails, so slow or broken runs can be compared.
+        # Its own errors are only logged, so they do not hide the run's.
+        try:
+            report.save(sts.RUN_REPORT_PATH, success=success)
+            report_s3 = s3u.BucketObjectConn(object_name=report.object_name())
+            report_s3.upload(sts.RUN_REPORT_PATH)
+        except Exception:
+            print("Failed to upload the run report.")
+            traceback.print_exc()
+        sts.RUN_REPORT_PATH.unlink(missing_ok=True)
+
+
+def update_assets(mode, start_date, end_date, report):
     # Connect to s3 resources
     spotify_s3 = s3u.BucketObjectConn(object_name=sts.SPOTIFY_ASSET_PATH.name)
     artist_genre_many_s3 = s3u.BucketObjectConn(
@@ -21,6 +42,7 @@ def main(mode="update"):
     artist_genre_prime_s3 = s3u.BucketObjectConn(
         object_name=sts.ARTIST_GENRE_PRIME_PATH.name
     )
+    genre_count_s3 = s3u.BucketObjectConn(object_name=sts.GENRE_COUNT_PATH.name)
 
     # Calculate dates
     today = dt.datetime.now(dt.timezone.utc).date()
@@ -28,7 +50,9 @@ def main(mode="update"):
     report_start = last_friday_from_today - dt.timedelta(weeks=53)
 
     # Initialise Spotify downloader
-    spotify_downloader = SpotifyDownloader(target_directory=sts.SPOTIFY_DATA_DIR)
+    spotify_downloader = SpotifyDownloader(
+        target_directory=sts.SPOTIFY_DATA_DIR, granularity=sts.CHART_GRANULARITY
+    )
 
     # If spotify asset exists
     if mode == "update":
@@ -41,38 +65,57 @@ def main(mode="update"):
         if spotify_downloader.is_available():
             print("Updating spotify assets...")
             # Download new spotify data
-            loop = asyncio.get_event_loop()
-            download_success = loop.run_until_complete(
-                spotify_downloader.download(loop)
+            spotify_new = download_spotify_data(
+                spotify_downloader, report, start_date=report_start
             )
 
-            if download_success:
-                # Download assets from s3 bucket
-                spotify_s3.download(sts.SPOTIFY_ASSET_PATH)
-                artist_genre_many_s3.download(sts.ARTIST_GENRE_MANY_PATH)
-                artist_genre_prime_s3.download(sts.ARTIST_GENRE_PRIME_PATH)
+            if spotify_new is not None and spotify_new.empty:
+                print("No new Spotify data available.")
+                return False
+
+            if spotify_new is not None:
+                with report.stage("load") as stage:
+                    # Download assets from s3 bucket
+                    spotify_s3.download(sts.SPOTIFY_ASSET_PATH)
+                    artist_genre_many_s3.download(sts.ARTIST_GENRE_MANY_PATH)
+                    artist_genre_prime_s3.download(sts.ARTIST_GENRE_PRIME_PATH)
 
-                # Unpickle spotify assets
-                spotify_hist = iou.decompress_pickle(sts.SPOTIFY_ASSET_PATH)
-                artist_genre_many = iou.load_pickle(sts.ARTIST_GENRE_MANY_PATH)
-                artist_genre_prime = iou.load_pickle(sts.ARTIST_GENRE_PRIME_PATH)
+                    # Unpickle spotify assets
+                    spotify_hist = iou.decompress_pickle(sts.SPOTIFY_ASSET_PATH)
+                    artist_genre_many = iou.load_pickle(sts.ARTIST_GENRE_MANY_PATH)
+                    artist_genre_prime = iou.load_pickle(sts.ARTIST_GENRE_PRIME_PATH)
+                    genre_counts = (
+                        iou.load_pickle(sts.GENRE_COUNT_PATH)
+                        if genre_count_s3.download(sts.GENRE_COUNT_PATH)
+                        else None
+                    )
+                    stage["rows"] = len(spotify_hist)
+                    stage["bytes"] = sts.SPOTIFY_ASSET_PATH.stat().st_size
 
                 # Aggregate spotify data
-                (
-                    spotify_new,
-                    artist_genre_many_new,
-                    artist_genre_prime_new,
-                ) = etl.build_spotify_assets(
-                    sts.SPOTIFY_DATA_DIR,
-                    start_date=report_start,
-                    artist_genre_many=artist_genre_many,
-                    artist_genre_prime=artist_genre_prime,
-                )
-                spotify_all = spotify_hist.merge(
-                    spotify_new, how="outer"
-                ).drop_duplicates()
+                with report.stage("enrich") as stage:
+                    (
+                        spotify_new,
+                        artist_genre_many_new,
+                        artist_genre_prime_new,
+                        genre_counts_new,
+                    ) = etl.add_genres(
+                        spotify_new,
+                        artist_genre_many=artist_genre_many,
+                        artist_genre_prime=artist_genre_prime,
+                        genre_counts=genre_counts,
+                    )
+                    stage["rows"] = len(spotify_new)
+                if sts.CHART_GRANULARITY == "daily":
+                    spotify_new = update_daily_asset(spotify_new, report, mode=mode)
+                    # Days stored so far may not complete a new week
+                    if spotify_new.empty:
+                        print("No new Spotify data available.")
+                        return False
 
-                spotify_all = etl.filter_one_year(spotify_all)
+                with report.stage("merge") as stage:
+                    spotify_all = etl.upsert_charts(spotify_hist, spotify_new)
+                    stage["rows"] = len(spotify_all)
 
             else:
                 print("Spotify download failed!")
@@ -87,71 +130,436 @@ def main(mode="update"):
         spotify_downloader.start_date = report_start
         spotify_downloader.end_date = last_friday_from_today
 
-        loop = asyncio.get_event_loop()
-        download_success = loop.run_until_complete(spotify_downloader.download(loop))
-        if download_success:
+        spotify_all = download_spotify_data(
+            spotify_downloader, report, start_date=report_start
+        )
+        if spotify_all is not None:
             # Aggregate spotify data
-            (
-                spotify_all,
-                artist_genre_many_new,
-                artist_genre_prime_new,
-            ) = etl.build_spotify_assets(
-                sts.SPOTIFY_DATA_DIR,
-                start_date=report_start,
-                artist_genre_many=dict(),
-                artist_genre_prime=dict(),
-            )
+            with report.stage("enrich") as stage:
+                (
+                    spotify_all,
+                    artist_genre_many_new,
+                    artist_genre_prime_new,
+                    genre_counts_new,
+                ) = etl.add_genres(
+                    spotify_all, artist_genre_many=dict(), artist_genre_prime=dict(),
+                )
+                stage["rows"] = len(spotify_all)
+            if sts.CHART_GRANULARITY == "daily":
+                spotify_all = update_daily_asset(spotify_all, report, mode=mode)
 
         # If spotify data unavailable
         else:
             print("Spotify data unavailable.")
             return False
 
+    elif mode == "backfill":
+        return backfill(
+            start_date=report_start if start_date is None else start_date,
+            end_date=last_friday_from_today if end_date is None else end_date,
+            report=report,
+        )
+
     elif mode == "refresh":
 
         spotify_s3 = s3u.BucketObjectConn(object_name=sts.SPOTIFY_ASSET_PATH.name)
-        spotify_s3.download(sts.SPOTIFY_ASSET_PATH)
-        spotify_hist = iou.decompress_pickle(sts.SPOTIFY_ASSET_PATH)
-
-        dtypes = {
-            "Position": "uint16",
-            "Track Name": pd.CategoricalDtype(),
-            "Artist": pd.CategoricalDtype(),
-            "Streams": "uint32",
-            "URL": "object",
-            "date": "datetime64[ns]",
-            "ISO2": pd.CategoricalDtype(),
-            "Genre": pd.CategoricalDtype(),
-        }
+        with report.stage("load") as stage:
+            spotify_s3.download(sts.SPOTIFY_ASSET_PATH)
+            spotify_hist = iou.decompress_pickle(sts.SPOTIFY_ASSET_PATH)
+            artist_genre_many = (
+                iou.load_pickle(sts.ARTIST_GENRE_MANY_PATH)
+                if artist_genre_many_s3.download(sts.ARTIST_GENRE_MANY_PATH)
+                else None
+            )
+            stage["rows"] = len(spotify_hist)
+            stage["bytes"] = sts.SPOTIFY_ASSET_PATH.stat().st_size
 
-        spotify_all = spotify_hist.astype(dtypes)
+        with report.stage("merge") as stage:
+            spotify_all = spotify_hist.astype(etl.SPOTIFY_ASSET_DTYPES)
 
-        # Keep two years of data
-        spotify_all = etl.filter_one_year(spotify_all)
+            # Keep two years of data
+            spotify_all = etl.filter_one_year(spotify_all)
+            stage["rows"] = len(spotify_all)
 
-        iou.compress_pickle(sts.SPOTIFY_ASSET_PATH, spotify_all)
-        spotify_s3.upload(sts.SPOTIFY_ASSET_PATH, last_data_date=spotify_all.date.max())
+        upload_asset(spotify_s3, sts.SPOTIFY_ASSET_PATH, spotify_all, report)
+        save_derived_assets(spotify_all, report, artist_genre_many)
 
         return True
     else:
         raise Exception(f"Unrecognised mode: {mode}")
 
     # Save spotify data and upload to s3
-    iou.compress_pickle(sts.SPOTIFY_ASSET_PATH, spotify_all)
-    iou.save_pickle(sts.ARTIST_GENRE_MANY_PATH, artist_genre_many_new)
-    iou.save_pickle(sts.ARTIST_GENRE_PRIME_PATH, artist_genre_prime_new)
+    upload_asset(spotify_s3, sts.SPOTIFY_ASSET_PATH, spotify_all, report)
+
+    with report.stage("upload") as stage:
+        iou.save_pickle(sts.ARTIST_GENRE_MANY_PATH, artist_genre_many_new)
+        iou.save_pickle(sts.ARTIST_GENRE_PRIME_PATH, artist_genre_prime_new)
+        iou.save_pickle(sts.GENRE_COUNT_PATH, genre_counts_new)
+
+        artist_genre_many_s3.upload(sts.ARTIST_GENRE_MANY_PATH)
+        artist_genre_prime_s3.upload(sts.ARTIST_GENRE_PRIME_PATH)
+        genre_count_s3.upload(sts.GENRE_COUNT_PATH)
+        stage["bytes"] = sum(
+            file_path.stat().st_size
+            for file_path in [
+                sts.ARTIST_GENRE_MANY_PATH,
+                sts.ARTIST_GENRE_PRIME_PATH,
+                sts.GENRE_COUNT_PATH,
+            ]
+        )
+    save_derived_assets(
+        spotify_all,
+        report,
+        artist_genre_many_new,
+        spotify_new=spotify_new if mode == "update" else None,
+    )
+
+    # Delete the other assets
+    sts.ARTIST_GENRE_MANY_PATH.unlink()
+    sts.ARTIST_GENRE_PRIME_PATH.unlink()
+    sts.GENRE_COUNT_PATH.unlink()
+
+    return True
+
+
+def save_asset(file_path, data, codec=sts.SPOTIFY_ASSET_CODEC):
+    iou.compress_pickle(file_path, data, codec=codec, threads=sts.COMPRESSION_THREADS)
+
+
+def upload_asset(asset_s3, file_path, spotify_df, report):
+    with report.stage("upload") as stage:
+        save_asset(file_path, spotify_df)
+        asset_s3.upload(file_path, last_data_date=spotify_df.date.max())
+        stage["rows"] = len(spotify_df)
+        stage["bytes"] = file_path.stat().st_size
+
+
+def download_spotify_data(spotify_downloader, report, start_date=None):
+    """Download charts into a typed frame, or return None if unavailable."""
+    loop = asyncio.get_event_loop()
+
+    # Parse response bodies as they arrive, without a round trip through disk
+    if sts.STREAM_DOWNLOADS:
+        parser = etl.ChartStreamParser()
+        with report.stage("download") as stage:
+            downloaded = loop.run_until_complete(
+                spotify_downloader.stream(loop, parser)
+            )
+            spotify_df = parser.to_frame() if downloaded else None
+            stage["rows"] = 0 if spotify_df is None else len(spotify_df)
+            stage["bytes"] = parser.bytes
+        return spotify_df
+
+    with report.stage("download") as stage:
+        downloaded = loop.run_until_complete(spotify_downloader.download(loop))
+        stage["bytes"] = sum(
+            file_path.stat().st_size
+            for file_path in spotify_downloader.target_directory.glob("*.csv")
+        )
+    if downloaded:
+        with report.stage("parse") as stage:
+            spotify_df = etl.load_chart_csvs(
+                spotify_downloader.target_directory, start_date=start_date
+            )
+            shutil.rmtree(spotify_downloader.target_directory)
+            stage["rows"] = len(spotify_df)
+        return spotify_df
+
+    return None
+
+
+def update_daily_asset(spotify_daily_new, report, mode="update"):
+    """Store the daily charts and return their weekly rollup."""
+    spotify_daily_s3 = s3u.BucketObjectConn(
+        object_name=sts.SPOTIFY_DAILY_ASSET_PATH.name
+    )
+
+    with report.stage("merge") as stage:
+        if mode == "update" and spotify_daily_s3.download(sts.SPOTIFY_DAILY_ASSET_PATH):
+            spotify_daily_hist = iou.decompress_pickle(sts.SPOTIFY_DAILY_ASSET_PATH)
+            spotify_daily_all = etl.upsert_charts(spotify_daily_hist, spotify_daily_new)
+        else:
+            spotify_daily_all = etl.filter_one_year(spotify_daily_new)
+        stage["rows"] = len(spotify_daily_all)
+
+    upload_asset(
+        spotify_daily_s3, sts.SPOTIFY_DAILY_ASSET_PATH, spotify_daily_all, report
+    )
+    sts.SPOTIFY_DAILY_ASSET_PATH.unlink()
+
+    # Weekly rollups are computed once here so the weekly views stay fast
+    with report.stage("rollup") as stage:
+        spotify_weekly_new = etl.rollup_daily_to_weekly(spotify_daily_new)
+        stage["rows"] = len(spotify_weekly_new)
+    return spotify_weekly_new
+
+
+def save_derived_assets(spotify_all, report, artist_genre_many=None, spotify_new=None):
+    """Precompute the dashboard's derived tables and upload them. The world
+    aggregates of the previous run are updated with `spotify_new` if given."""
+    derived_s3 = s3u.BucketObjectConn(object_name=sts.SPOTIFY_DERIVED_ASSET_PATH.name)
+    world_aggregates = None
+    if spotify_new is not None and derived_s3.download(sts.SPOTIFY_DERIVED_ASSET_PATH):
+        previous = etl.load_derived_assets(sts.SPOTIFY_DERIVED_ASSET_PATH).get("world")
+        if previous and previous["depth"] == sts.DASHBOARD_CHART_DEPTH:
+            with report.stage("aggregate") as stage:
+                world_aggregates = etl.update_world_aggregates(
+                    previous,
+                    spotify_new,
+                    etl.load_country_info(sts.GEOGRAPHY_DATA_PATH),
+                    start_date=spotify_all.date.min(),
+                )
+                stage["rows"] = len(spotify_new)
+
+    with report.stage("derive") as stage:
+        derived_assets = etl.build_derived_assets(
+            spotify_all, artist_genre_many, world_aggregates
+        )
+        save_asset(
+            sts.SPOTIFY_DERIVED_ASSET_PATH,
+            derived_assets,
+            codec=sts.SPOTIFY_DERIVED_ASSET_CODEC,
+        )
+        stage["rows"] = len(spotify_all)
+
+    with report.stage("upload") as stage:
+        derived_s3.upload(
+            sts.SPOTIFY_DERIVED_ASSET_PATH, last_data_date=spotify_all.date.max()
+        )
+        stage["bytes"] = sts.SPOTIFY_DERIVED_ASSET_PATH.stat().st_size
+
+    save_country_partitions(derived_assets, report, spotify_all.date.max())
+    save_snapshot(derived_assets, report)
+
+
+def save_country_partitions(derived_assets, report, last_data_date):
+    """Upload the global rollup and per-country partitions of the derived assets,
+    for dashboards with COUNTRY_PARTITIONS set."""
+    with report.stage("partition") as stage:
+        rollup, partitions = etl.split_country_partitions(derived_assets)
+        save_asset(
+            sts.SPOTIFY_ROLLUP_PATH, rollup, codec=sts.SPOTIFY_DERIVED_ASSET_CODEC
+        )
+        partition_paths = {}
+        for iso2, partition in partitions.items():
+            file_path = etl.country_partition_path(sts.SPOTIFY_COUNTRY_DIR, iso2)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            save_asset(file_path, partition, codec=sts.SPOTIFY_DERIVED_ASSET_CODEC)
+            partition_paths[iso2] = file_path
+        stage["rows"] = len(partitions)
+
+    with report.stage("upload") as stage:
+        rollup_s3 = s3u.BucketObjectConn(object_name=sts.SPOTIFY_ROLLUP_PATH.name)
+        rollup_s3.upload(sts.SPOTIFY_ROLLUP_PATH, last_data_date=last_data_date)
+        stage["bytes"] = stage.get("bytes", 0) + sts.SPOTIFY_ROLLUP_PATH.stat().st_size
+        for iso2, file_path in partition_paths.items():
+            partition_s3 = s3u.BucketObjectConn(
+                object_name=etl.country_partition_object_name(iso2)
+            )
+            partition_s3.upload(file_path, last_data_date=last_data_date)
+            stage["bytes"] += file_path.stat().st_size
+        shutil.rmtree(sts.SPOTIFY_COUNTRY_DIR)
+
+
+def save_snapshot(derived_assets, report):
+    """Export the initial dashboard for the new assets and upload it."""
+    # The dashboard renders other granularities from the chart asset itself
+    if sts.DASHBOARD_GRANULARITY != "weekly":
+        print("Dashboard snapshot skipped: only weekly views are exported.")
+        return
+
+    world_view_df = derived_assets["world"]["world_view"]
+    with report.stage("snapshot") as stage:
+        # Versioned by the files the dashboard loads, so it can check the snapshot
+        # before loading them
+        snapshot.save_snapshot(
+            sts.SNAPSHOT_LAYOUT_PATH,
+            layout.build_layout(
+                {
+                    name: render(world_view_df, derived_assets)
+                    for name, render in layout.section_renderers()
+                }
+            ),
+            [
+                iou.file_digest(file_path)
+                for file_path in [
+                    sts.SPOTIFY_DERIVED_ASSET_PATH,
+                    sts.SPOTIFY_ROLLUP_PATH,
+                ]
+            ],
+        )
+        stage["bytes"] = sts.SNAPSHOT_LAYOUT_PATH.stat().st_size
+
+    with report.stage("upload"):
+        snapshot_s3 = s3u.BucketObjectConn(object_name=sts.SNAPSHOT_LAYOUT_PATH.name)
+        snapshot_s3.upload(sts.SNAPSHOT_LAYOUT_PATH, content_type="application/json")
+
+
+def backfill(start_date, end_date, report, countries_per_chunk=10):
+    spotify_s3 = s3u.BucketObjectConn(object_name=sts.SPOTIFY_ASSET_PATH.name)
+    artist_genre_many_s3 = s3u.BucketObjectConn(
+        object_name=sts.ARTIST_GENRE_MANY_PATH.name
+    )
+    artist_genre_prime_s3 = s3u.BucketObjectConn(
+        object_name=sts.ARTIST_GENRE_PRIME_PATH.name
+    )
+    genre_count_s3 = s3u.BucketObjectConn(object_name=sts.GENRE_COUNT_PATH.name)
+    checkpoint_s3 = s3u.BucketObjectConn(object_name=sts.BACKFILL_CHECKPOINT_PATH.name)
+
+    # Resume from the last checkpoint, if any
+    if checkpoint_s3.download(sts.BACKFILL_CHECKPOINT_PATH):
+        checkpoint = iou.load_json(sts.BACKFILL_CHECKPOINT_PATH)
+    else:
+        checkpoint = {"completed": {}}
+    # Weeks without a global chart are skipped, and not retried on resume
+    unavailable = checkpoint.setdefault("unavailable", [])
+
+    # Reuse the artist -> genre maps to avoid repeat API calls
+    if artist_genre_many_s3.download(
+        sts.ARTIST_GENRE_MANY_PATH
+    ) and artist_genre_prime_s3.download(sts.ARTIST_GENRE_PRIME_PATH):
+        artist_genre_many = iou.load_pickle(sts.ARTIST_GENRE_MANY_PATH)
+        artist_genre_prime = iou.load_pickle(sts.ARTIST_GENRE_PRIME_PATH)
+    else:
+        artist_genre_many = dict()
+        artist_genre_prime = dict()
+
+    genre_counts = (
+        iou.load_pickle(sts.GENRE_COUNT_PATH)
+        if genre_count_s3.download(sts.GENRE_COUNT_PATH)
+        else None
+    )
+
+    for period_start, period_end in generate_dates(start_date, end_date):
+        week = period_start.strftime("%Y-%m-%d")
+        if week in unavailable:
+            continue
+        week_downloader = SpotifyDownloader(
+            target_directory=sts.SPOTIFY_DATA_DIR / week, start_date=period_start
+        )
+        # Probed once per week; weeks already started are known to exist
+        if week not in checkpoint["completed"] and not week_downloader.is_available():
+            print(f"Warning: no chart data for {week}, skipping.")
+            unavailable.append(week)
+            iou.save_json(sts.BACKFILL_CHECKPOINT_PATH, checkpoint)
+            checkpoint_s3.upload(sts.BACKFILL_CHECKPOINT_PATH)
+            continue
+
+        completed = checkpoint["completed"].setdefault(week, [])
+        remaining = [
+            country
+            for country in SpotifyDownloader.country_codes
+            if country not in completed
+        ]
+
+        for i in range(0, len(remaining), countries_per_chunk):
+            countries = remaining[i : i + countries_per_chunk]
+            spotify_downloader = SpotifyDownloader(
+                target_directory=sts.SPOTIFY_DATA_DIR / week,
+                start_date=period_start,
+                end_date=period_end,
+                countries=countries,
+            )
+
+            print(f"Backfilling {week}: {', '.join(countries)}")
+            spotify_chunk = download_spotify_data(spotify_downloader, report)
+            if spotify_chunk is None:
+                print("Spotify download failed! Progress saved to checkpoint.")
+                return False
+
+            # Countries without chart data for the week produce no rows
+            if not spotify_chunk.empty:
+                with report.stage("enrich") as stage:
+                    (
+                        spotify_chunk,
+                        artist_genre_many,
+                        artist_genre_prime,
+                        genre_counts,
+                    ) = etl.add_genres(
+                        spotify_chunk,
+                        artist_genre_many=artist_genre_many,
+                        artist_genre_prime=artist_genre_prime,
+                        genre_counts=genre_counts,
+                    )
+                    stage["rows"] = len(spotify_chunk)
+
+                with report.stage("upload") as stage:
+                    for file_path in etl.save_partitions(
+                        sts.SPOTIFY_PARTITION_DIR, spotify_chunk
+                    ):
+                        partition_s3 = s3u.BucketObjectConn(
+                            object_name=etl.partition_object_name(
+                                sts.SPOTIFY_PARTITION_DIR, file_path
+                            )
+                        )
+                        partition_s3.upload(file_path)
+                        stage["bytes"] = (
+                            stage.get("bytes", 0) + file_path.stat().st_size
+                        )
+                        file_path.unlink()
+                    stage["rows"] = len(spotify_chunk)
+
+            # Record the checkpoint only once the chunk is safely stored
+            completed.extend(countries)
+            iou.save_pickle(sts.ARTIST_GENRE_MANY_PATH, artist_genre_many)
+            iou.save_pickle(sts.ARTIST_GENRE_PRIME_PATH, artist_genre_prime)
+            iou.save_json(sts.BACKFILL_CHECKPOINT_PATH, checkpoint)
+            artist_genre_many_s3.upload(sts.ARTIST_GENRE_MANY_PATH)
+            artist_genre_prime_s3.upload(sts.ARTIST_GENRE_PRIME_PATH)
+            if genre_counts is not None:
+                iou.save_pickle(sts.GENRE_COUNT_PATH, genre_counts)
+                genre_count_s3.upload(sts.GENRE_COUNT_PATH)
+            checkpoint_s3.upload(sts.BACKFILL_CHECKPOINT_PATH)
+
+    # Rebuild the dashboard asset from the retention window only
+    print("Consolidating partitions...")
+    retention_start = (end_date - dt.timedelta(weeks=53)).strftime("%Y-%m-%d")
+    retained_weeks = [
+        week
+        for week in sorted(checkpoint["completed"])
+        if retention_start <= week <= end_date.strftime("%Y-%m-%d")
+    ]
+    partition_paths = []
+    with report.stage("load") as stage:
+        for week in retained_weeks:
+            for country in checkpoint["completed"][week]:
+                file_path = etl.partition_path(
+                    sts.SPOTIFY_PARTITION_DIR,
+                    dt.datetime.strptime(week, "%Y-%m-%d"),
+                    country.upper(),
+                )
+                partition_s3 = s3u.BucketObjectConn(
+                    object_name=etl.partition_object_name(
+                        sts.SPOTIFY_PARTITION_DIR, file_path
+                    )
+                )
+                if partition_s3.download(file_path):
+                    partition_paths.append(file_path)
+        stage["bytes"] = sum(path.stat().st_size for path in partition_paths)
+
+    with report.stage("merge") as stage:
+        spotify_all = etl.filter_one_year(etl.load_partitions(partition_paths))
+        stage["rows"] = len(spotify_all)
+
+    # Keep the current asset rather than replace it with an empty one
+    if spotify_all.empty:
+        print("No chart data in the retention window.")
+        return False
 
-    spotify_s3.upload(sts.SPOTIFY_ASSET_PATH, last_data_date=spotify_all.date.max())
-    artist_genre_many_s3.upload(sts.ARTIST_GENRE_MANY_PATH)
-    artist_genre_prime_s3.upload(sts.ARTIST_GENRE_PRIME_PATH)
+    upload_asset(spotify_s3, sts.SPOTIFY_ASSET_PATH, spotify_all, report)
+    save_derived_assets(spotify_all, report, artist_genre_many)
 
-    # Delete the spotify chart data and other assets
-    shutil.rmtree(sts.SPOTIFY_DATA_DIR)
+    shutil.rmtree(sts.SPOTIFY_PARTITION_DIR)
+    sts.BACKFILL_CHECKPOINT_PATH.unlink()
     sts.ARTIST_GENRE_MANY_PATH.unlink()
     sts.ARTIST_GENRE_PRIME_PATH.unlink()
+    sts.GENRE_COUNT_PATH.unlink(missing_ok=True)
 
     return True
 
 
 if __name__ == "__main__":
-    main(mode="update")
+    # e.g. python -m spotify_dash.jobs.maintain_data_asset backfill 2017-01-06 2020-10-02
+    run_mode = sys.argv[1] if len(sys.argv) > 1 else "update"
+    run_dates = [dt.datetime.strptime(x, "%Y-%m-%d").date() for x in sys.argv[2:4]]
+    main(run_mode, *run_dates)
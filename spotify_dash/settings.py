@@ -8,12 +8,73 @@ load_dotenv()
 BASE_DIRECTORY = os.path.dirname(os.path.realpath(__file__))
 RESOURCE = os.path.abspath(os.path.join(BASE_DIRECTORY, "resources"))
 
+# Chart period downloaded by the ETL job: "weekly" or "daily".
+# Daily charts are also rolled up into the weekly asset.
+CHART_GRANULARITY = os.environ.get("CHART_GRANULARITY", "weekly")
+# Chart period shown in the dashboard: "weekly" or "daily"
+DASHBOARD_GRANULARITY = os.environ.get("DASHBOARD_GRANULARITY", "weekly")
+
+# Assets keep their .pkl.bz names, which are also their S3 keys, whatever codec
+# they are stored with. The codec is read from the file's leading bytes.
 SPOTIFY_ASSET_PATH = pathlib.Path(RESOURCE, "processed/spotify_data.pkl.bz")
-SPOTIFY_DATA_DIR = pathlib.Path(RESOURCE, "external/spotifycharts/weekly/")
+SPOTIFY_DAILY_ASSET_PATH = pathlib.Path(RESOURCE, "processed/spotify_data_daily.pkl.bz")
+DASHBOARD_ASSET_PATH = (
+    SPOTIFY_DAILY_ASSET_PATH if DASHBOARD_GRANULARITY == "daily" else SPOTIFY_ASSET_PATH
+)
+# Track-level tables precomputed from the weekly asset by the ETL job
+SPOTIFY_DERIVED_ASSET_PATH = pathlib.Path(RESOURCE, "processed/spotify_derived.pkl.bz")
+# The derived asset without its per-country tables, which are stored by country
+SPOTIFY_ROLLUP_PATH = pathlib.Path(RESOURCE, "processed/spotify_rollup.pkl.bz")
+SPOTIFY_COUNTRY_DIR = pathlib.Path(RESOURCE, "processed/countries/")
+SPOTIFY_DATA_DIR = pathlib.Path(
+    RESOURCE, f"external/spotifycharts/{CHART_GRANULARITY}/"
+)
+SPOTIFY_PARTITION_DIR = pathlib.Path(RESOURCE, "processed/partitions/")
+BACKFILL_CHECKPOINT_PATH = pathlib.Path(RESOURCE, "processed/backfill-checkpoint.json")
+RUN_REPORT_PATH = pathlib.Path(RESOURCE, "processed/run-report.json")
+# Initial dashboard layout exported by the ETL job, as Dash JSON
+SNAPSHOT_LAYOUT_PATH = pathlib.Path(RESOURCE, "processed/dashboard-snapshot.json")
 ARTIST_GENRE_MANY_PATH = pathlib.Path(
     RESOURCE, "interim/artists/artist-to-genre-many.pkl"
 )
 ARTIST_GENRE_PRIME_PATH = pathlib.Path(
     RESOURCE, "interim/artists/artist-to-genre-one.pkl"
 )
+GENRE_COUNT_PATH = pathlib.Path(RESOURCE, "interim/artists/genre-count.pkl")
 GEOGRAPHY_DATA_PATH = pathlib.Path(RESOURCE, "external/geography/countryInfo.txt")
+
+# Compression codec of each stored asset: "zstd", "lz4", "bz2" or "none". Assets are
+# decompressed at every dashboard start, so decode speed matters more than size.
+SPOTIFY_ASSET_CODEC = os.environ.get("SPOTIFY_ASSET_CODEC", "zstd")
+SPOTIFY_DERIVED_ASSET_CODEC = os.environ.get("SPOTIFY_DERIVED_ASSET_CODEC", "zstd")
+PARTITION_CODEC = os.environ.get("PARTITION_CODEC", "bz2")
+# Threads used by the ETL job to compress assets with zstd; -1 uses every CPU
+COMPRESSION_THREADS = int(os.environ.get("COMPRESSION_THREADS", -1))
+
+# Parse chart downloads in memory as they arrive instead of via temporary files
+STREAM_DOWNLOADS = os.environ.get("STREAM_DOWNLOADS", "true").lower() == "true"
+
+# Number of chart positions kept per country and week by the ETL job
+CHART_DEPTH = int(os.environ.get("CHART_DEPTH", 200))
+# Number of chart positions aggregated into the dashboard views
+DASHBOARD_CHART_DEPTH = int(os.environ.get("DASHBOARD_CHART_DEPTH", 100))
+
+# Load the global rollup and each country's track charts on first use, for regional
+# replicas that mostly serve a few countries (weekly dashboards only)
+COUNTRY_PARTITIONS = os.environ.get("COUNTRY_PARTITIONS", "false").lower() == "true"
+# Number of countries kept in memory when COUNTRY_PARTITIONS is set
+COUNTRY_PARTITION_CACHE_SIZE = int(os.environ.get("COUNTRY_PARTITION_CACHE_SIZE", 8))
+
+# Fill the dashboard's view caches for its default inputs in the background at startup
+CACHE_WARMUP = os.environ.get("CACHE_WARMUP", "true").lower() == "true"
+CACHE_WARMUP_THREADS = int(os.environ.get("CACHE_WARMUP_THREADS", 4))
+
+# Serve a loading shell at startup and fill the dashboard's sections as the data loads
+# in a thread started on import. gunicorn_config.py turns it off, as the gunicorn
+# master loads the data itself once its first workers are forked.
+BACKGROUND_LOADING = os.environ.get("BACKGROUND_LOADING", "true").lower() == "true"
+# Seconds between attempts when the dashboard data fails to load in the background
+LOAD_RETRY_SECONDS = int(os.environ.get("LOAD_RETRY_SECONDS", 60))
+
+# Maximum seconds allowed to import the dashboard code, checked by the test suite
+STARTUP_BUDGET_SECONDS = float(os.environ.get("STARTUP_BUDGET_SECONDS", 3.0))
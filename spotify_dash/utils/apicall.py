@@ -1,4 +1,5 @@
 import os
+from collections import Counter
 from typing import List
 
 import requests
@@ -13,12 +14,17 @@ TRACKS_ENDPOINT = BASE_URL + "tracks"
 ARTIST_ENDPOINT = BASE_URL + "artists"
 
 AUTH_URL = "https://accounts.spotify.com/api/token"
-SPOTIFY_CLIENT_ID = os.environ["SPOTIFY_CLIENT_ID"]
-SPOTIFY_CLIENT_SECRET = os.environ["SPOTIFY_CLIENT_SECRET"]
+# Only needed by the ETL job, so the dashboard can import without them
+SPOTIFY_CLIENT_ID = os.environ.get("SPOTIFY_CLIENT_ID")
+SPOTIFY_CLIENT_SECRET = os.environ.get("SPOTIFY_CLIENT_SECRET")
+
+# Requests made and retried in this process, read by the ETL run report
+API_STATS = Counter()
 
 
 def get_spotify_api_token():
     # POST
+    API_STATS["calls"] += 1
     auth_response = requests.post(
         AUTH_URL,
         {
@@ -77,12 +83,14 @@ def api_get(endpoint, headers, ids, retries):
         attempts = 0
         while attempts < retries:
             r_raw = requests.get(endpoint, headers=headers, params=params)
+            API_STATS["calls"] += 1
 
             if r_raw.ok:
                 r_json = r_raw.json()
                 break
             else:
                 attempts += 1
+                API_STATS["retries"] += attempts < retries
                 print(f"Request failed - attempts: {attempts}")
 
         if r_json:
@@ -7,3 +7,19 @@ def get_last_friday_from(x):
         return x - dt.timedelta(weekday - 4)
     else:
         return x - dt.timedelta(weekday + 3)
+
+
+PERIOD_DAYS = {"weekly": 7, "daily": 1}
+
+
+def generate_dates(start_date, end_date, granularity="weekly"):
+    period_days = PERIOD_DAYS[granularity]
+    period_start = (
+        get_last_friday_from(start_date) if granularity == "weekly" else start_date
+    )
+    period_end = period_start + dt.timedelta(period_days)
+
+    while period_end <= end_date:
+        yield period_start, period_end
+        period_start += dt.timedelta(period_days)
+        period_end += dt.timedelta(period_days)
@@ -3,18 +3,33 @@ import datetime as dt
 import itertools
 import pathlib
 from collections import Counter
-from typing import Iterable
+from typing import Iterable, List, Tuple
 
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 from tqdm import tqdm
 
+import spotify_dash.settings as sts
 import spotify_dash.utils.io as iou
 import spotify_dash.utils.apicall as api
+from spotify_dash.utils.dates import PERIOD_DAYS
 
 
 # TODO: Replace os with pathlib
 # TODO: Take artist -> genre maps as input and keep on s3
 
+SPOTIFY_ASSET_DTYPES = {
+    "Position": "uint16",
+    "Track Name": pd.CategoricalDtype(),
+    "Artist": pd.CategoricalDtype(),
+    "Streams": "uint32",
+    "URL": "object",
+    "date": "datetime64[ns]",
+    "ISO2": pd.CategoricalDtype(),
+    "Genre": pd.CategoricalDtype(),
+}
+
 
 def load_country_info(geographic_data_path) -> pd.DataFrame:
     keepcols = [
@@ -41,65 +56,125 @@ def load_country_info(geographic_data_path) -> pd.DataFrame:
     return df00
 
 
-def build_spotify_assets(
-    spotify_weekly_dir: pathlib.Path,
-    artist_genre_many: dict,
-    artist_genre_prime: dict,
-    start_date=None,
-):
-    weekly_data = spotify_weekly_dir.iterdir()
+CHART_COLUMNS = 'Position,"Track Name",Artist,Streams,URL'
+CHART_DTYPES = {
+    "Position": "uint16",
+    "Track Name": pd.CategoricalDtype(),
+    "Artist": pd.CategoricalDtype(),
+    "Streams": "uint32",
+    "URL": str,
+    "date": str,
+    "ISO2": pd.CategoricalDtype(),
+}
 
-    spotify_weekly_paths = [
-        pathlib.Path(spotify_weekly_dir, file)
-        for file in weekly_data
-        if file.name[-14:-4] >= start_date.strftime("%Y-%m-%d")
-    ]
 
-    def concatenate_country_csvs(csv_list: Iterable[str]) -> pd.DataFrame:
-        expected_columns = 'Position,"Track Name",Artist,Streams,URL'
-        target_columns = expected_columns.replace('"', "").split(",") + ["date", "ISO2"]
+def parse_chart_csv(lines: Iterable[str], date, country, depth=sts.CHART_DEPTH):
+    lines = iter(lines)
+    next(lines, None)  # Skip the first row
+    if CHART_COLUMNS not in next(lines, ""):  # Check and skip the headers
+        return None
+    # Keep only the top n
+    return [x + [date, country] for x in itertools.islice(csv.reader(lines), depth)]
 
-        def process_csv(file_path: pathlib.Path):
-            date = file_path.name[-14:-4]
-            country = file_path.name[:2].upper()
-            records = list()
 
-            with file_path.open("r", encoding="utf-8") as f:
-                next(f)  # Skip the first row
-                if expected_columns in f.readline():  # Check and skip the headers
-                    lines = list(csv.reader(f))[:100]  # Keep only the top 100
-                    records += [x + [date, country] for x in lines]
-                else:
-                    print(f"Unexpected file format: {file_path}")
+def chart_records_to_frame(records) -> pd.DataFrame:
+    df = pd.DataFrame(records, columns=list(CHART_DTYPES)).astype(CHART_DTYPES)
+    df.date = pd.to_datetime(df.date, format="%Y-%m-%d")
+    return df
 
-            return records
 
-        data = [process_csv(csv_path) for csv_path in tqdm(csv_list)]
-        data = list(itertools.chain.from_iterable(data))
+class ChartStreamParser:
+    """Parse chart CSVs as they arrive into typed, categorical frames."""
 
-        dtypes = {
-            "Position": int,
-            "Track Name": pd.CategoricalDtype(),
-            "Artist": pd.CategoricalDtype(),
-            "Streams": int,
-            "URL": str,
-            "date": str,
-            "ISO2": pd.CategoricalDtype(),
-        }
+    def __init__(self, depth=sts.CHART_DEPTH, batch_size=500):
+        self.depth = depth
+        self.batch_size = batch_size
+        self.records = list()
+        self.pending = 0
+        self.frames = list()
+        self.bytes = 0
+
+    def __call__(self, country, date, body: bytes):
+        self.bytes += len(body)
+        records = parse_chart_csv(
+            body.decode("utf-8").splitlines(), date, country.upper(), self.depth
+        )
+        if records is None:
+            print(f"Unexpected file format: {country} {date}")
+            return
+
+        self.records += records
+        self.pending += 1
+
+        # Convert in batches so that raw string records for only one batch
+        # are held in memory at a time (daily charts are ~7x weekly).
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.records:
+            self.frames.append(chart_records_to_frame(self.records))
+        self.records = list()
+        self.pending = 0
+
+    def to_frame(self) -> pd.DataFrame:
+        self.flush()
+        if not self.frames:
+            return chart_records_to_frame([])
+        return concat_categorical(self.frames)
+
+
+def load_chart_csvs(
+    spotify_weekly_dir: pathlib.Path,
+    start_date=None,
+    depth=sts.CHART_DEPTH,
+    batch_size=500,
+) -> pd.DataFrame:
+    spotify_weekly_paths = [
+        pathlib.Path(spotify_weekly_dir, file)
+        for file in spotify_weekly_dir.iterdir()
+        if start_date is None or file.name[-14:-4] >= start_date.strftime("%Y-%m-%d")
+    ]
 
-        df = pd.DataFrame(data, columns=target_columns).astype(dtypes)
-        df.date = pd.to_datetime(df.date, format="%Y-%m-%d")
+    parser = ChartStreamParser(depth=depth, batch_size=batch_size)
+    for file_path in tqdm(spotify_weekly_paths):
+        parser(file_path.name[:2], file_path.name[-14:-4], file_path.read_bytes())
 
-        return df
+    return parser.to_frame()
 
+
+def build_spotify_assets(
+    spotify_weekly_dir: pathlib.Path,
+    artist_genre_many: dict,
+    artist_genre_prime: dict,
+    start_date=None,
+    depth=sts.CHART_DEPTH,
+    batch_size=500,
+    genre_counts: Counter = None,
+):
     # Load raw data files.
     print("Concatenating files...")
-    spotify_df_00 = concatenate_country_csvs(spotify_weekly_paths)
+    spotify_df_00 = load_chart_csvs(
+        spotify_weekly_dir, start_date=start_date, depth=depth, batch_size=batch_size
+    )
+    return add_genres(
+        spotify_df_00, artist_genre_many, artist_genre_prime, genre_counts
+    )
+
+
+def add_genres(
+    spotify_df_00,
+    artist_genre_many: dict,
+    artist_genre_prime: dict,
+    genre_counts: Counter = None,
+):
+    # Build the genre frequency index once; afterwards it is updated incrementally.
+    if genre_counts is None:
+        genre_counts = build_genre_counts(artist_genre_many)
+
     spotify_df_01 = spotify_df_00.copy()
-    spotify_df_01.loc[:, "Genre"] = (
-        spotify_df_01.loc[:, "Artist"]
-        .map(lambda x: artist_genre_prime.get(x, None))
-        .astype(pd.CategoricalDtype())
+    spotify_df_01.loc[:, "Genre"] = assign_genres(
+        spotify_df_01.loc[:, "Artist"], artist_genre_prime
     )
 
     # Check for new artists.
@@ -107,7 +182,7 @@ def build_spotify_assets(
         spotify_df_01.loc[
             ((spotify_df_01["Genre"].isna()) & (~spotify_df_01["Artist"].isna())), :
         ]
-        .groupby("Artist")["URL"]
+        .groupby("Artist", observed=True)["URL"]
         .first()
         .dropna()
     )
@@ -118,20 +193,14 @@ def build_spotify_assets(
             lambda x: x.split("/")[-1]
         ).to_list()
         new_artists_map = api.get_genres_from_tracks(new_artist_track_ids)
+        update_genre_counts(genre_counts, artist_genre_many, new_artists_map)
         artist_genre_many.update(new_artists_map)
 
-        all_genres = list(
-            filter(lambda x: isinstance(x, list), artist_genre_many.values())
-        )
-        genre_list = list(itertools.chain.from_iterable(all_genres))
-        c = Counter
-        artists_per_genre = c(genre_list)
-
         # Map each new artist to the most common genre they are associated with.
         artist_genre_prime.update(
             {
                 artist: (
-                    sorted(genres, key=lambda x: -artists_per_genre[x])[0].title()
+                    max(genres, key=lambda x: genre_counts[x]).title()
                     if isinstance(genres, list) and genres
                     else "Unknown"
                 )
@@ -140,11 +209,144 @@ def build_spotify_assets(
         )
 
         # Map primary genre to new songs.
-        spotify_df_01.loc[:, "Genre"] = spotify_df_01.loc[:, "Artist"].map(
-            lambda x: artist_genre_prime.get(x, None)
+        spotify_df_01.loc[:, "Genre"] = assign_genres(
+            spotify_df_01.loc[:, "Artist"], artist_genre_prime
+        )
+
+    return spotify_df_01, artist_genre_many, artist_genre_prime, genre_counts
+
+
+def build_genre_counts(artist_genre_many: dict) -> Counter:
+    all_genres = filter(lambda x: isinstance(x, list), artist_genre_many.values())
+    return Counter(itertools.chain.from_iterable(all_genres))
+
+
+def update_genre_counts(
+    genre_counts: Counter, artist_genre_many: dict, new_artists_map: dict
+) -> Counter:
+    # Call before adding the new artists so re-catalogued artists are not counted twice.
+    for artist, genres in new_artists_map.items():
+        old_genres = artist_genre_many.get(artist, None)
+        if isinstance(old_genres, list):
+            genre_counts.subtract(old_genres)
+        if isinstance(genres, list):
+            genre_counts.update(genres)
+    return genre_counts
+
+
+def assign_genres(artists: pd.Series, artist_genre_prime: dict) -> pd.Series:
+    # Look up each distinct artist once, then join to the rows on the artist codes.
+    artists = artists.astype(pd.CategoricalDtype())
+    artist_genres = pd.Categorical(artists.cat.categories.map(artist_genre_prime))
+    # Missing artists have code -1, which picks up the trailing -1 (missing genre).
+    genre_codes = np.append(artist_genres.codes, -1)[artists.cat.codes.values]
+    return pd.Series(
+        pd.Categorical.from_codes(genre_codes, categories=artist_genres.categories),
+        index=artists.index,
+    )
+
+
+def concat_categorical(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    # Union the categories first, otherwise pandas falls back to object columns.
+    dtypes = {
+        column: pd.CategoricalDtype(
+            union_categoricals(
+                [frame[column] for frame in frames], ignore_order=True
+            ).categories
         )
+        for column in frames[0].select_dtypes("category").columns
+    }
+    frames = [frame.astype(dtypes, copy=False) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def upsert_charts(
+    hist_df, new_df, retention=dt.timedelta(weeks=51), date_col="date"
+) -> pd.DataFrame:
+    # Rows are keyed on (ISO2, date, Position). Each country-date in new_df replaces
+    # the whole country-date in hist_df, and dates outside the retention window are
+    # dropped. History is kept sorted by date so that only the slices for the new
+    # dates are inspected.
+    sort_cols = [date_col, "ISO2", "Position"]
+    new_df = new_df.drop_duplicates(["ISO2", date_col, "Position"], keep="last")
+
+    # With either side empty there is nothing to replace, only dates to expire
+    if hist_df.empty or new_df.empty:
+        df = new_df if hist_df.empty else hist_df
+        df = df.loc[df[date_col] >= df[date_col].max() - retention]
+        return df.sort_values(sort_cols, kind="mergesort").reset_index(drop=True)
+
+    new_df = new_df.sort_values(sort_cols)
+    if not hist_df[date_col].is_monotonic_increasing:
+        hist_df = hist_df.sort_values(sort_cols, kind="mergesort")
+
+    hist_dates = hist_df[date_col].values
+    hist_countries = hist_df["ISO2"].array
+    keep = np.ones(len(hist_df), dtype=bool)
+
+    # Expired dates form a prefix of the sorted history
+    cutoff = max(hist_dates[-1], new_df[date_col].values[-1]) - np.timedelta64(
+        retention
+    )
+    keep[: np.searchsorted(hist_dates, cutoff, side="left")] = False
+
+    for date, countries in new_df.groupby(date_col, observed=True)["ISO2"]:
+        lo = np.searchsorted(hist_dates, np.datetime64(date), side="left")
+        hi = np.searchsorted(hist_dates, np.datetime64(date), side="right")
+        keep[lo:hi] &= ~np.isin(np.asarray(hist_countries[lo:hi]), countries.unique())
+
+    new_df = new_df.loc[new_df[date_col].values >= cutoff]
+    spotify_all = concat_categorical([hist_df.loc[keep], new_df])
+
+    # New dates normally follow the history; re-sort only if a past date was replaced
+    if not spotify_all[date_col].is_monotonic_increasing:
+        spotify_all = spotify_all.sort_values(sort_cols, kind="mergesort")
+
+    return spotify_all.reset_index(drop=True)
+
+
+def rollup_daily_to_weekly(daily_df, depth=sts.CHART_DEPTH) -> pd.DataFrame:
+    daily_df = daily_df.copy()
+    daily_df.loc[:, "days"] = daily_df["date"]
+
+    # Label each day with the Friday that starts its chart week
+    daily_df.loc[:, "date"] = daily_df["date"] - pd.to_timedelta(
+        (daily_df["date"].dt.weekday - 4) % 7, unit="D"
+    )
+    daily_df.loc[:, "URL"] = daily_df["URL"].astype(pd.CategoricalDtype())
 
-    return spotify_df_01, artist_genre_many, artist_genre_prime
+    # Track details are taken from the first day of each week rather than with
+    # groupby.first, which aggregates categorical columns one group at a time
+    group_cols = ["ISO2", "date", "URL"]
+    weekly_streams = (
+        daily_df.groupby(group_cols, observed=True, sort=False)["Streams"]
+        .sum()
+        .reset_index()
+    )
+    weekly_df = (
+        daily_df.drop_duplicates(group_cols)
+        .loc[:, group_cols + ["Track Name", "Artist", "Genre"]]
+        .merge(weekly_streams, on=group_cols)
+    )
+
+    # Drop partial weeks at either end of the period
+    days_per_week = (
+        daily_df.drop_duplicates(["ISO2", "date", "days"])
+        .groupby(["ISO2", "date"], observed=True)
+        .size()
+        .rename("days")
+    )
+    weekly_df = weekly_df.join(days_per_week, on=["ISO2", "date"])
+    weekly_df = weekly_df.loc[weekly_df["days"] == 7]
+
+    # Re-rank each country-week by total streams
+    weekly_df = weekly_df.sort_values(
+        ["ISO2", "date", "Streams"], ascending=[True, True, False]
+    )
+    weekly_df.loc[:, "Position"] = weekly_df.groupby(["ISO2", "date"]).cumcount() + 1
+    weekly_df = weekly_df.loc[weekly_df["Position"] <= depth]
+
+    return weekly_df.loc[:, list(SPOTIFY_ASSET_DTYPES)].astype(SPOTIFY_ASSET_DTYPES)
 
 
 def filter_one_year(df, date_col="date"):
@@ -153,3 +355,422 @@ def filter_one_year(df, date_col="date"):
 
 def load_spotify_asset(spotify_asset_path):
     return iou.decompress_pickle(spotify_asset_path)
+
+
+def build_track_assets(spotify_df) -> dict:
+    # Each track gets an integer code, so track-level views can aggregate with
+    # array operations instead of grouping on strings.
+    track_codes, track_urls = pd.factorize(spotify_df["URL"].astype(str))
+    track_codes = track_codes.astype("int32")
+
+    # Codes follow the order of first appearance, so this is the first row per track
+    _, first_rows = np.unique(track_codes, return_index=True)
+    tracks = pd.DataFrame(
+        {
+            "Track Name": spotify_df["Track Name"].to_numpy()[first_rows],
+            "Artist": spotify_df["Artist"].to_numpy()[first_rows],
+            "Genre": spotify_df["Genre"].to_numpy()[first_rows],
+            "URL": track_urls,
+        }
+    ).astype(
+        {
+            "Track Name": pd.CategoricalDtype(),
+            "Artist": pd.CategoricalDtype(),
+            "Genre": pd.CategoricalDtype(),
+        }
+    )
+
+    # Chart entries by country and week, sorted by date for range lookups
+    track_charts = (
+        pd.DataFrame(
+            {
+                "date": spotify_df["date"].to_numpy(),
+                "ISO2": pd.Categorical(spotify_df["ISO2"]),
+                "Track": track_codes,
+                "Position": spotify_df["Position"].to_numpy(dtype="uint16"),
+                "Streams": spotify_df["Streams"].to_numpy(dtype="uint32"),
+            }
+        )
+        .sort_values(["date", "ISO2", "Position"], kind="mergesort")
+        .reset_index(drop=True)
+    )
+
+    # Streams per track and week across all countries, sorted by track
+    track_weeks = (
+        track_charts.groupby(["Track", "date"], sort=True)["Streams"]
+        .sum()
+        .astype("uint64")
+        .reset_index()
+    )
+
+    return {"tracks": tracks, "track_charts": track_charts, "track_weeks": track_weeks}
+
+
+def add_chart_movements(
+    track_charts, period=np.timedelta64(PERIOD_DAYS["weekly"], "D")
+) -> pd.DataFrame:
+    # Compare each entry with the previous row of the same country and track in a
+    # (country, track, date)-sorted copy, instead of grouping per track.
+    order = np.lexsort(
+        (
+            track_charts["date"].to_numpy(),
+            track_charts["Track"].to_numpy(),
+            track_charts["ISO2"].cat.codes.to_numpy(),
+        )
+    )
+    countries = track_charts["ISO2"].cat.codes.to_numpy()[order]
+    codes = track_charts["Track"].to_numpy()[order]
+    dates = track_charts["date"].to_numpy()[order]
+    positions = track_charts["Position"].to_numpy()[order]
+
+    same_track = np.zeros(len(order), dtype=bool)
+    same_track[1:] = (countries[1:] == countries[:-1]) & (codes[1:] == codes[:-1])
+    consecutive = same_track.copy()
+    consecutive[1:] &= dates[1:] - dates[:-1] == period
+
+    # Position in the previous period, or 0 for new entries and re-entries
+    last_position = np.zeros(len(order), dtype="uint16")
+    last_position[1:] = np.where(consecutive[1:], positions[:-1], 0)
+
+    # Periods charted so far, counted from the first row of each country-track run
+    rows = np.arange(len(order))
+    run_start = np.maximum.accumulate(np.where(same_track, 0, rows))
+    weeks_on_chart = (rows - run_start + 1).astype("uint16")
+
+    # Scatter back into the original row order
+    movements = {
+        "Last Position": last_position,
+        "Weeks On Chart": weeks_on_chart,
+    }
+    for column, values in movements.items():
+        movements[column] = np.empty_like(values)
+        movements[column][order] = values
+
+    return track_charts.assign(**movements)
+
+
+CONCENTRATION_METRICS = [
+    "Top 10 Artist Share",
+    "Artist HHI",
+    "Genre HHI",
+    "Genre Entropy",
+]
+
+
+def stream_shares(chart_codes, item_codes, streams):
+    # Streams of each (country-week, item) pair as a share of the country-week
+    pairs, pair_codes = np.unique(
+        np.stack([chart_codes, item_codes]), axis=1, return_inverse=True
+    )
+    pair_streams = np.bincount(pair_codes.ravel(), weights=streams)
+    chart_streams = np.bincount(pairs[0], weights=pair_streams)
+    return pairs[0], pair_streams / chart_streams[pairs[0]]
+
+
+def build_concentration_metrics(spotify_df, depth=sts.DASHBOARD_CHART_DEPTH):
+    # Every country-week is handled in one pass over integer codes, rather than
+    # a groupby per metric.
+    spotify_df = spotify_df.loc[spotify_df["Position"] <= depth]
+    chart_codes, charts = pd.MultiIndex.from_arrays(
+        [spotify_df["date"], spotify_df["ISO2"].astype(str)]
+    ).factorize()
+    streams = spotify_df["Streams"].to_numpy(dtype="float64")
+    n_charts = len(charts)
+
+    artist_charts, artist_shares = stream_shares(
+        chart_codes, pd.factorize(spotify_df["Artist"])[0], streams
+    )
+    genre_charts, genre_shares = stream_shares(
+        chart_codes, pd.factorize(spotify_df["Genre"])[0], streams
+    )
+
+    # Pairs are sorted by country-week, so rank artists within each block
+    order = np.lexsort((-artist_shares, artist_charts))
+    block_starts = np.searchsorted(artist_charts[order], np.arange(n_charts))
+    ranks = np.arange(len(order)) - block_starts[artist_charts[order]]
+    top_10 = order[ranks < 10]
+
+    concentration = pd.DataFrame(
+        {
+            "date": charts.get_level_values(0),
+            "ISO2": charts.get_level_values(1),
+            "Top 10 Artist Share": np.bincount(
+                artist_charts[top_10], weights=artist_shares[top_10], minlength=n_charts
+            ),
+            "Artist HHI": np.bincount(
+                artist_charts, weights=artist_shares ** 2, minlength=n_charts
+            ),
+            "Genre HHI": np.bincount(
+                genre_charts, weights=genre_shares ** 2, minlength=n_charts
+            ),
+            "Genre Entropy": np.bincount(
+                genre_charts,
+                weights=-genre_shares * np.log(genre_shares),
+                minlength=n_charts,
+            ),
+        }
+    )
+
+    return concentration.sort_values(["date", "ISO2"]).reset_index(drop=True)
+
+
+def build_artist_genre_weights(spotify_df, artist_genre_many: dict = None) -> dict:
+    # Imported here so scipy is only loaded when the weights are built
+    from scipy import sparse
+
+    # Each artist's streams are split evenly over all of their genres. Artists
+    # without a genre list keep their prime genre, or "Unknown" if it is missing.
+    artist_genre_many = dict() if artist_genre_many is None else artist_genre_many
+    prime_genres = spotify_df.drop_duplicates("Artist").loc[:, ["Artist", "Genre"]]
+
+    artist_rows, genres = [], []
+    for row, (artist, prime_genre) in enumerate(prime_genres.itertuples(index=False)):
+        artist_genres = artist_genre_many.get(artist, None)
+        if not isinstance(artist_genres, list) or not artist_genres:
+            artist_genres = ["Unknown" if pd.isna(prime_genre) else prime_genre]
+        artist_rows.extend([row] * len(artist_genres))
+        genres.extend(artist_genres)
+
+    artist_rows = np.asarray(artist_rows)
+    genre_codes, genre_index = pd.factorize(pd.Series(genres, dtype="object"))
+    weights = sparse.csr_matrix(
+        (1 / np.bincount(artist_rows)[artist_rows], (artist_rows, genre_codes),),
+        shape=(len(prime_genres), len(genre_index)),
+    )
+
+    return {
+        "artists": pd.Index(prime_genres["Artist"].astype(str)),
+        "genres": pd.Index(genre_index),
+        "weights": weights,
+    }
+
+
+def build_similar_artists(spotify_df) -> dict:
+    # Each artist is a unit vector of its streams by country, so the artists with
+    # the most similar markets have the largest dot products.
+    artist_codes, artists = pd.factorize(spotify_df["Artist"].astype(str))
+    country_codes, countries = pd.factorize(spotify_df["ISO2"].astype(str))
+    vectors = np.bincount(
+        artist_codes * len(countries) + country_codes,
+        weights=spotify_df["Streams"].to_numpy(dtype="float64"),
+        minlength=len(artists) * len(countries),
+    ).reshape(len(artists), len(countries))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return {
+        "artists": pd.Index(artists),
+        "vectors": vectors.astype("float32"),
+    }
+
+
+def build_world_view(spotify_df, country_info, depth=None) -> pd.DataFrame:
+    # IMPORTANT: Pandas has issues performing groupby operations on DataFrames containing categorical data.
+    # Categorical fields are explicitly converted to object type in the next step.
+
+    dtypes = {
+        "Position": "uint16",
+        "Track Name": "object",
+        "Artist": "object",
+        "Streams": "uint32",
+        "URL": "object",
+        "date": "datetime64[ns]",
+        "ISO2": "object",
+        "Genre": "object",
+    }
+
+    spotify_df_00 = spotify_df
+
+    # Aggregate only the requested chart depth, e.g. the top 100 of the stored top 200.
+    if depth is not None:
+        spotify_df_00 = spotify_df_00.loc[spotify_df_00["Position"] <= depth]
+
+    spotify_df_00 = spotify_df_00.astype(dtypes)
+    spotify_df_01 = (
+        spotify_df_00.groupby(["ISO2", "date", "Artist", "Genre"])["Streams"]
+        .sum()
+        .to_frame()
+    )
+    country_info_00 = country_info.copy()
+    country_info_00.loc[:, "Continent"] = country_info_00.loc[:, "Continent"].map(
+        {
+            "AF": "Africa",
+            "AS": "Asia",
+            "NA": "North America",
+            "OC": "Asia",
+            "EU": "Europe",
+            "SA": "South America",
+        }
+    )
+    world_view_df = spotify_df_01.join(country_info_00, how="inner")
+
+    # Drop incorrectly labelled Greenland streams...
+    world_view_df = world_view_df[world_view_df["Country"] != "Greenland"]
+
+    # Index and sort by date first, so any date range is a contiguous block of rows
+    world_view_df = world_view_df.reorder_levels(
+        ["date", "ISO2", "Artist", "Genre"]
+    ).sort_index()
+    world_view_df.index = world_view_df.index.remove_unused_levels()
+
+    return world_view_df
+
+
+def world_view_totals(world_view_df) -> pd.Series:
+    # Streams per country, artist and genre over all periods of the world view,
+    # as int64 since a year of streams overflows the uint32 of a single week
+    return (
+        world_view_df.groupby(["Country", "ISO2", "Artist", "Genre"])["Streams"]
+        .sum()
+        .astype("int64")
+    )
+
+
+def build_world_aggregates(spotify_df, country_info, depth=None) -> dict:
+    world_view_df = build_world_view(spotify_df, country_info, depth=depth)
+    return {
+        "depth": depth,
+        "world_view": world_view_df,
+        "totals": world_view_totals(world_view_df),
+    }
+
+
+def update_world_aggregates(
+    world_aggregates, spotify_new, country_info, start_date=None
+) -> dict:
+    """Add the charts in `spotify_new` to the world aggregates and drop periods
+    before `start_date`. Each country-period in `spotify_new` replaces the one in
+    the aggregates, as in `upsert_charts`, so only the changed periods are
+    aggregated."""
+    new_view = build_world_view(
+        spotify_new, country_info, depth=world_aggregates["depth"]
+    )
+    world_view_df = world_aggregates["world_view"]
+
+    # The world view is sorted by date, so expired periods are a prefix and
+    # replaced periods lie in the suffix from the first new date.
+    new_dates = view_dates(new_view)
+    start = world_view_df.index.slice_locs(start_date)[0] if start_date else 0
+    tail = max(start, world_view_df.index.slice_locs(new_dates[0])[0])
+    tail_view = world_view_df.iloc[tail:]
+    replaced = pd.MultiIndex.from_arrays(
+        [
+            tail_view.index.get_level_values("date"),
+            tail_view.index.get_level_values("ISO2"),
+        ]
+    ).isin(new_view.index.droplevel(["Artist", "Genre"]).unique())
+
+    removed = pd.concat([world_view_df.iloc[:start], tail_view.loc[replaced]])
+    updated = pd.concat(
+        [world_view_df.iloc[start:tail], tail_view.loc[~replaced], new_view]
+    )
+    if not updated.index.is_monotonic_increasing:
+        updated = updated.sort_index()
+    updated.index = updated.index.remove_unused_levels()
+
+    totals = (
+        world_aggregates["totals"]
+        .add(world_view_totals(new_view), fill_value=0)
+        .sub(world_view_totals(removed), fill_value=0)
+    )
+    totals = totals.loc[totals > 0].astype("int64").sort_index()
+
+    return {"depth": world_aggregates["depth"], "world_view": updated, "totals": totals}
+
+
+def view_dates(world_view_df) -> pd.DatetimeIndex:
+    return world_view_df.index.levels[world_view_df.index.names.index("date")]
+
+
+def build_derived_assets(
+    spotify_df, artist_genre_many: dict = None, world_aggregates: dict = None
+) -> dict:
+    # Only the world aggregates can be updated from the previous run; the track,
+    # concentration, artist genre and similar artist tables are rebuilt from
+    # `spotify_df` every time.
+    derived_assets = build_track_assets(spotify_df)
+    derived_assets["world"] = (
+        build_world_aggregates(
+            spotify_df,
+            load_country_info(sts.GEOGRAPHY_DATA_PATH),
+            depth=sts.DASHBOARD_CHART_DEPTH,
+        )
+        if world_aggregates is None
+        else world_aggregates
+    )
+    derived_assets["concentration"] = build_concentration_metrics(spotify_df)
+    derived_assets["artist_genres"] = build_artist_genre_weights(
+        spotify_df, artist_genre_many
+    )
+    derived_assets["similar_artists"] = build_similar_artists(spotify_df)
+    return derived_assets
+
+
+def load_derived_assets(derived_asset_path) -> dict:
+    return iou.decompress_pickle(derived_asset_path)
+
+
+# Columns of the world view used by the dashboard
+ROLLUP_COLUMNS = ["Streams", "Country", "ISO3", "Continent"]
+
+
+def split_country_partitions(derived_assets) -> Tuple[dict, dict]:
+    """Split the track charts out of the derived assets by country. Returns the
+    global rollup, with a world view trimmed to the columns the dashboard uses
+    and empty track charts, and a dict of country partitions keyed by ISO2."""
+    rollup = dict(derived_assets, track_charts=derived_assets["track_charts"].iloc[:0])
+    world = derived_assets["world"]
+    rollup["world"] = dict(
+        world, world_view=world["world_view"].loc[:, ROLLUP_COLUMNS].copy()
+    )
+
+    partitions = {
+        iso2: {"track_charts": track_charts.reset_index(drop=True)}
+        for iso2, track_charts in derived_assets["track_charts"].groupby(
+            "ISO2", observed=True, sort=True
+        )
+    }
+    return rollup, partitions
+
+
+def country_partition_path(country_dir, iso2) -> pathlib.Path:
+    return pathlib.Path(country_dir, f"{iso2}.pkl.bz")
+
+
+def country_partition_object_name(iso2) -> str:
+    return f"countries/{iso2}.pkl.bz"
+
+
+def partition_path(partition_dir, date, country) -> pathlib.Path:
+    return pathlib.Path(partition_dir, date.strftime("%Y-%m-%d"), f"{country}.pkl.bz")
+
+
+def partition_object_name(partition_dir, file_path) -> str:
+    relative_path = pathlib.Path(file_path).relative_to(partition_dir).as_posix()
+    return f"partitions/{relative_path}"
+
+
+def save_partitions(partition_dir, df) -> List[pathlib.Path]:
+    # One file per country-week, so a chunk can be written and uploaded on its own.
+    paths = []
+    for (date, country), partition in df.groupby(["date", "ISO2"], observed=True):
+        file_path = partition_path(partition_dir, date, country)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        iou.compress_pickle(
+            file_path, partition.reset_index(drop=True), codec=sts.PARTITION_CODEC
+        )
+        paths.append(file_path)
+    return paths
+
+
+def load_partitions(partition_paths: Iterable[pathlib.Path]) -> pd.DataFrame:
+    partitions = [
+        iou.decompress_pickle(file_path)
+        for file_path in partition_paths
+        if pathlib.Path(file_path).is_file()
+    ]
+    if not partitions:
+        return pd.DataFrame(columns=list(SPOTIFY_ASSET_DTYPES)).astype(
+            SPOTIFY_ASSET_DTYPES
+        )
+    df = pd.concat(partitions, ignore_index=True)
+    return df.astype(SPOTIFY_ASSET_DTYPES)
@@ -1,5 +1,28 @@
 import _pickle as cpickle
 import bz2
+import hashlib
+import json
+
+# Optional codecs, see CODECS
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+CODECS = ("zstd", "lz4", "bz2", "none")
+
+# Leading bytes of each compressed format, so files can be read without
+# knowing which codec wrote them. Anything else is read as a plain pickle.
+CODEC_MAGIC = {
+    b"\x28\xb5\x2f\xfd": "zstd",
+    b"\x04\x22\x4d\x18": "lz4",
+    b"BZh": "bz2",
+}
 
 
 def save_pickle(file_path, data):
@@ -12,12 +35,74 @@ def load_pickle(file_path):
         return cpickle.load(f)
 
 
-def compress_pickle(file_path, data):
-    with bz2.BZ2File(file_path, "w") as f:
-        cpickle.dump(data, f)
+def codec_available(codec) -> bool:
+    return {"zstd": zstandard, "lz4": lz4_frame}.get(codec, True) is not None
+
+
+def sniff_codec(file_path) -> str:
+    with open(file_path, "rb") as f:
+        header = f.read(4)
+    for magic, codec in CODEC_MAGIC.items():
+        if header.startswith(magic):
+            return codec
+    return "none"
+
+
+def compress_pickle(file_path, data, codec="bz2", threads=0):
+    """Pickle `data` to `file_path` with `codec`; zstd uses `threads` workers
+    when compressing, or one per CPU if -1."""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec: {codec}")
+    if not codec_available(codec):
+        print(f"The {codec} codec is not installed, using bz2 instead.")
+        codec = "bz2"
+
+    if codec == "bz2":
+        with bz2.BZ2File(file_path, "w") as f:
+            cpickle.dump(data, f)
+        return
+
+    payload = cpickle.dumps(data, protocol=-1)
+    if codec == "zstd":
+        payload = zstandard.ZstdCompressor(level=3, threads=threads).compress(payload)
+    elif codec == "lz4":
+        payload = lz4_frame.compress(payload)
+
+    with open(file_path, "wb") as f:
+        f.write(payload)
 
 
 def decompress_pickle(file_path):
-    data = bz2.open(file_path, "rb")
-    data = cpickle.load(data)
-    return data
+    codec = sniff_codec(file_path)
+    if not codec_available(codec):
+        raise ImportError(f"The {codec} codec is needed to read {file_path}")
+    if codec == "bz2":
+        with bz2.open(file_path, "rb") as f:
+            return cpickle.load(f)
+
+    with open(file_path, "rb") as f:
+        payload = f.read()
+    if codec == "zstd":
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    elif codec == "lz4":
+        payload = lz4_frame.decompress(payload)
+    return cpickle.loads(payload)
+
+
+def save_json(file_path, data):
+    with open(file_path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def load_json(file_path):
+    with open(file_path, "r") as f:
+        return json.load(f)
+
+
+def file_digest(file_path, chunk_size=1 << 20) -> str:
+    # Identifies a file by its contents, without decompressing or unpickling it
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
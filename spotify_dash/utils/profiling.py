@@ -0,0 +1,177 @@
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import spotify_dash.settings as sts
+import spotify_dash.utils.io as iou
+
+IMPORT_TIME_PATTERN = re.compile(r"import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)")
+
+
+def import_times(module) -> Counter:
+    # Self time in seconds of every module imported, in a fresh interpreter.
+    # A module's self time includes running its body, e.g. building the layout.
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = Counter()
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            times[match.group(2)] += int(match.group(1)) / 1e6
+    return times
+
+
+# Points the dashboard at local assets, so that nothing is downloaded, then imports
+# it and waits for the data to load
+COLD_START_SCRIPT = """
+import json, pathlib, sys, time
+import spotify_dash.settings as sts
+
+sts.DASHBOARD_ASSET_PATH = pathlib.Path(sys.argv[1])
+sts.SPOTIFY_DERIVED_ASSET_PATH = pathlib.Path(sys.argv[2])
+sts.SNAPSHOT_LAYOUT_PATH = pathlib.Path(sys.argv[3])
+sts.CACHE_WARMUP = False
+sts.BACKGROUND_LOADING = True
+
+started = time.perf_counter()
+import spotify_dash.dashapp as dashapp
+imported = time.perf_counter() - started
+if not dashapp.data_ready.wait(timeout=float(sys.argv[4])):
+    sys.exit("The dashboard did not load.")
+loaded = time.perf_counter() - started
+with open(sys.argv[5], "w") as f:
+    json.dump({"import": imported, "load": loaded, "modules": sorted(sys.modules)}, f)
+"""
+
+
+def cold_start(asset_path, derived_asset_path, snapshot_path, cwd=None, timeout=60):
+    """Import the dashboard in a fresh interpreter and load the given assets.
+    Returns the seconds to import and to load, and the modules imported."""
+    # The interpreter may run in another directory, e.g. to keep the view cache out
+    # of the source tree
+    source_root = str(Path(sts.BASE_DIRECTORY).parent)
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(
+            filter(None, [source_root, os.getenv("PYTHONPATH")])
+        ),
+    )
+    # Written to a file, as the dashboard prints from its loading thread
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result_path = Path(tmp_dir, "cold-start.json")
+        arguments = [
+            asset_path,
+            derived_asset_path,
+            snapshot_path,
+            timeout,
+            result_path,
+        ]
+        subprocess.run(
+            [sys.executable, "-c", COLD_START_SCRIPT, *map(str, arguments)],
+            capture_output=True,
+            check=True,
+            cwd=cwd,
+            env=env,
+        )
+        return iou.load_json(result_path)
+
+
+def startup_report(module="spotify_dash.dashapp", top=15) -> str:
+    times = import_times(module)
+    packages = Counter()
+    for name, seconds in times.items():
+        packages[name.split(".")[0]] += seconds
+
+    lines = [f"Startup time for {module}: {sum(times.values()):.2f}s", "By package:"]
+    lines += [f"  {name:<40} {secs:6.2f}s" for name, secs in packages.most_common(top)]
+    lines += ["Slowest modules:"]
+    lines += [f"  {name:<40} {secs:6.2f}s" for name, secs in times.most_common(top)]
+    return "\n".join(lines)
+
+
+def codec_report(asset_path=sts.SPOTIFY_ASSET_PATH, repeat=3) -> str:
+    # Size against compress and decode time for each installed codec. Decode
+    # time is the best of `repeat` reads, as paid at every dashboard start.
+    data = iou.decompress_pickle(asset_path)
+    lines = [
+        f"Codecs for {Path(asset_path).name}:",
+        f"  {'codec':<6} {'size MB':>9} {'compress s':>11} {'decode s':>9}",
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for codec in filter(iou.codec_available, iou.CODECS):
+            file_path = Path(tmp_dir, f"asset.{codec}")
+            start = time.perf_counter()
+            iou.compress_pickle(
+                file_path, data, codec=codec, threads=sts.COMPRESSION_THREADS
+            )
+            compress_secs = time.perf_counter() - start
+
+            decode_secs = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                iou.decompress_pickle(file_path)
+                decode_secs = min(decode_secs, time.perf_counter() - start)
+
+            size_mb = file_path.stat().st_size / 1e6
+            lines.append(
+                f"  {codec:<6} {size_mb:>9.2f} {compress_secs:>11.2f} {decode_secs:>9.2f}"
+            )
+
+    return "\n".join(lines)
+
+
+def engine_report(asset_path=sts.DASHBOARD_ASSET_PATH, repeat=3) -> str:
+    # Aggregation kernels against the pandas groupby they replace, on the world view
+    from spotify_dash.core import engine
+    from spotify_dash.core.views import world_view
+
+    world_view_df = world_view(asset_path, sts.GEOGRAPHY_DATA_PATH)
+    cases = {
+        "Artist": ["Artist"],
+        "Country, Genre": ["ISO2", "Genre"],
+        "date, Artist": ["date", "Artist"],
+        "Country, Artist, Genre": ["ISO2", "Artist", "Genre"],
+    }
+
+    def best_of(func):
+        seconds = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            seconds = min(seconds, time.perf_counter() - start)
+        return seconds
+
+    lines = [
+        f"Group sums over {len(world_view_df):,d} rows:",
+        f"  {'keys':<24} {'engine s':>9} {'groupby s':>10}",
+    ]
+    for name, keys in cases.items():
+        engine_secs = best_of(lambda: engine.group_sum(world_view_df, keys))
+        groupby_secs = best_of(
+            lambda: world_view_df.groupby(keys)["Streams"].sum().reset_index()
+        )
+        lines.append(f"  {name:<24} {engine_secs:>9.3f} {groupby_secs:>10.3f}")
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # e.g. python -m spotify_dash.utils.profiling spotify_dash.dashapp
+    #      python -m spotify_dash.utils.profiling codecs [asset path]
+    #      python -m spotify_dash.utils.profiling engine [asset path]
+    if sys.argv[1:2] == ["codecs"]:
+        print(codec_report(*sys.argv[2:3]))
+    elif sys.argv[1:2] == ["engine"]:
+        print(engine_report(*sys.argv[2:3]))
+    else:
+        print(startup_report(*sys.argv[1:2]))
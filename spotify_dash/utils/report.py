@@ -0,0 +1,62 @@
+import contextlib
+import datetime as dt
+import resource
+import time
+
+import spotify_dash.utils.apicall as api
+import spotify_dash.utils.io as iou
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class RunReport:
+    """Wall time, throughput and resource use of each stage of an ETL run."""
+
+    def __init__(self, mode):
+        self.started = dt.datetime.now(dt.timezone.utc)
+        self.start_time = time.perf_counter()
+        self.mode = mode
+        self.stages = dict()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time a stage. The yielded dict takes counters such as rows and bytes;
+        repeated stages, e.g. backfill chunks, are summed."""
+        counters = dict()
+        api_stats = api.API_STATS.copy()
+        start = time.perf_counter()
+        try:
+            yield counters
+        finally:
+            counters["seconds"] = time.perf_counter() - start
+            counters["api_calls"] = api.API_STATS["calls"] - api_stats["calls"]
+            counters["api_retries"] = api.API_STATS["retries"] - api_stats["retries"]
+
+            stage = self.stages.setdefault(name, {"runs": 0})
+            stage["runs"] += 1
+            for key, value in counters.items():
+                stage[key] = stage.get(key, 0) + value
+            stage["seconds"] = round(stage["seconds"], 3)
+            stage["peak_rss_mb"] = peak_rss_mb()
+
+    def to_dict(self, success=None) -> dict:
+        return {
+            "mode": self.mode,
+            "started": self.started.isoformat(),
+            "seconds": round(time.perf_counter() - self.start_time, 3),
+            "success": success,
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": self.stages,
+        }
+
+    def object_name(self) -> str:
+        return (
+            f"run-reports/{self.started.strftime('%Y-%m-%dT%H%M%S')}-{self.mode}.json"
+        )
+
+    def save(self, file_path, success=None):
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        iou.save_json(file_path, self.to_dict(success))
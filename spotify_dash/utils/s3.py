@@ -29,19 +29,22 @@ class BucketObjectConn:
             print("S3 asset not found")
             return False
 
-    def upload(self, file_path, last_data_date: dt.datetime = None):
+    def upload(
+        self, file_path, last_data_date: dt.datetime = None, content_type: str = None
+    ):
         print(
             f"Uploading {file_path.name} to S3://{self.bucket_name}/{self.object_name}...",
             end=" ",
         )
         try:
+            extra_args = dict()
             if last_data_date:
                 date_str = last_data_date.strftime("%Y-%m-%d")
-                extra_args = dict(Metadata={"last-data-date": date_str})
-            else:
-                extra_args = None
+                extra_args["Metadata"] = {"last-data-date": date_str}
+            if content_type:
+                extra_args["ContentType"] = content_type
             self.conn.upload_file(
-                str(file_path), self.bucket_name, self.object_name, extra_args
+                str(file_path), self.bucket_name, self.object_name, extra_args or None
             )
             print("Complete.")
             return True
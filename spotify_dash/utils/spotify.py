@@ -8,7 +8,7 @@ import aiohttp
 import async_timeout
 import requests
 
-from spotify_dash.utils.dates import get_last_friday_from
+from spotify_dash.utils.dates import PERIOD_DAYS, generate_dates
 
 
 class SpotifyDownloader:
@@ -17,14 +17,17 @@ class SpotifyDownloader:
         target_directory,
         start_date: dt.datetime = None,
         end_date: dt.datetime = None,
+        countries=None,
+        granularity="weekly",
         sem=1000,
     ):
         self.start_date = start_date
         self.end_date = end_date
+        self.granularity = granularity
+        self.countries = self.country_codes if countries is None else countries
         self.target_directory = target_directory
         self.base_url = "https://spotifycharts.com/regional"
         self.sem = sem
-        self.target_directory.mkdir(parents=True, exist_ok=True)
 
     country_codes = (
         # "global",
@@ -96,11 +99,22 @@ class SpotifyDownloader:
     )
 
     def _url_builder(self, country, start, end):
+        if self.granularity == "daily":
+            return (
+                f"{self.base_url}/{country}/daily/{start.strftime('%Y-%m-%d')}/download"
+            )
         return f"{self.base_url}/{country}/weekly/{start.strftime('%Y-%m-%d')}--{end.strftime('%Y-%m-%d')}/download"
 
     def is_available(self):
+        # Daily charts are probed on the last day of the first week, as only
+        # complete weeks are rolled up into the weekly asset
+        probe_date = self.start_date
+        if self.granularity == "daily":
+            probe_date += dt.timedelta(PERIOD_DAYS["weekly"] - 1)
         url = self._url_builder(
-            "global", self.start_date, self.start_date + dt.timedelta(7)
+            "global",
+            probe_date,
+            probe_date + dt.timedelta(PERIOD_DAYS[self.granularity]),
         )
         for _ in range(5):
             response = requests.get(url)
@@ -110,19 +124,10 @@ class SpotifyDownloader:
                 time.sleep(0.2)
 
     def generate_urls(self, countries, start_date, end_date):
-        def generate_dates(start_date_, end_date_):
-            period_start = get_last_friday_from(start_date_)
-            period_end = period_start + dt.timedelta(7)
-
-            while period_end <= end_date_:
-                yield period_start, period_end
-                period_start += dt.timedelta(7)
-                period_end += dt.timedelta(7)
-
         urls = (
             self._url_builder(country, start, end)
             for country in countries
-            for start, end in generate_dates(start_date, end_date)
+            for start, end in generate_dates(start_date, end_date, self.granularity)
         )
 
         return urls
@@ -135,6 +140,8 @@ class SpotifyDownloader:
                 f"Date end:   {self.end_date}\n"
             )
 
+            self.target_directory.mkdir(parents=True, exist_ok=True)
+
             async def fetch(url_, session_, target_directory_):
                 with async_timeout.timeout(10):
                     async with session_.get(url_) as r:
@@ -157,9 +164,7 @@ class SpotifyDownloader:
                         return await r.release()
 
             sem = asyncio.Semaphore(1000)
-            urls = self.generate_urls(
-                self.country_codes, self.start_date, self.end_date
-            )
+            urls = self.generate_urls(self.countries, self.start_date, self.end_date)
 
             async with aiohttp.ClientSession(loop=event_loop) as session:
                 async with sem:
@@ -171,6 +176,55 @@ class SpotifyDownloader:
             print("Spotify chart data unavailable.")
             return False
 
+    async def stream(self, event_loop, process_body, queue_size=100, fetchers=8):
+        """Download charts, passing each response body to `process_body`, which is
+        called from a worker thread, one body at a time."""
+        if self.is_available():
+            print(
+                f"Streaming data from {self.base_url}\n"
+                f"Date start: {self.start_date}\n"
+                f"Date end:   {self.end_date}\n"
+            )
+
+            # Bounded, so parsing overlaps downloading without buffering everything
+            queue = asyncio.Queue(maxsize=queue_size)
+            sem = asyncio.Semaphore(fetchers)
+
+            async def fetch(url_, session_):
+                async with sem:
+                    with async_timeout.timeout(10):
+                        async with session_.get(url_) as r:
+                            if r.status == 200:
+                                country = url_.split("/")[-4]
+                                period_start = url_.split("/")[-2][:10]
+                                body = await r.read()
+                                await queue.put((country, period_start, body))
+
+            async def produce(session_):
+                try:
+                    urls = self.generate_urls(
+                        self.countries, self.start_date, self.end_date
+                    )
+                    await asyncio.gather(*(fetch(url_, session_) for url_ in urls))
+                finally:
+                    await queue.put(None)
+
+            async def consume():
+                # Parsing is CPU bound, so it runs off the loop while fetches continue
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    await event_loop.run_in_executor(None, process_body, *item)
+
+            async with aiohttp.ClientSession(loop=event_loop) as session:
+                await asyncio.gather(produce(session), consume())
+            print("Download complete.")
+            return True
+        else:
+            print("Spotify chart data unavailable.")
+            return False
+
 
 if __name__ == "__main__":
     pass
@@ -0,0 +1,87 @@
+import pandas as pd
+import pytest
+from flask import Flask, abort
+
+import spotify_dash.core.api as api
+
+
+def world_view_fixture():
+    # Two weeks of artist streams in GB, and one artist in FR
+    rows = [
+        ["GB", "United Kingdom", date, artist, "rock", 100 * (rank + 1) + week]
+        for week, date in enumerate(pd.to_datetime(["2020-01-03", "2020-01-10"]))
+        for rank, artist in enumerate(["AC/DC", "Adele", "Blur"])
+    ] + [["FR", "France", pd.Timestamp("2020-01-10"), "AC/DC", "rock", 7]]
+    return pd.DataFrame(
+        rows, columns=["ISO2", "Country", "date", "Artist", "Genre", "Streams"]
+    ).set_index(["ISO2", "date", "Artist"])
+
+
+def api_client(index_loader):
+    app = Flask(__name__)
+    app.register_blueprint(api.create_blueprint(index_loader))
+    return app.test_client()
+
+
+@pytest.fixture
+def client():
+    index = api.ApiIndex(world_view_fixture())
+    return api_client(lambda: index)
+
+
+def test_top_artists_pages(client):
+    response = client.get("/api/countries/gb/top-artists?per_page=2&page=2")
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "country": "GB",
+        "week": "2020-01-10",
+        "page": 2,
+        "per_page": 2,
+        "total": 3,
+        "results": [{"rank": 3, "artist": "AC/DC", "genre": "rock", "streams": 101}],
+    }
+
+    response = client.get("/api/countries/gb/top-artists?per_page=0")
+    assert response.status_code == 400
+    assert "per_page" in response.get_json()["error"]
+
+
+def test_unknown_country_is_not_found(client):
+    response = client.get("/api/countries/xx/top-artists")
+    assert response.status_code == 404
+    assert response.get_json() == {"error": "Unknown country: xx"}
+
+
+def test_bad_week_is_rejected(client):
+    response = client.get("/api/countries/gb/top-artists?week=last")
+    assert response.status_code == 400
+    assert "week" in response.get_json()["error"]
+
+    response = client.get("/api/countries/fr/top-artists?week=2020-01-03")
+    assert response.status_code == 404
+
+
+def test_artist_series_with_slash(client):
+    response = client.get("/api/artists/AC/DC/series")
+    assert response.get_json()["results"] == [
+        {"week": "2020-01-03", "streams": 100},
+        {"week": "2020-01-10", "streams": 108},
+    ]
+
+    response = client.get("/api/artists/AC/DC/series?country=fr")
+    assert response.get_json()["results"] == [{"week": "2020-01-10", "streams": 7}]
+
+
+def test_empty_data_is_not_found():
+    index = api.ApiIndex(world_view_fixture().iloc[:0])
+    response = api_client(lambda: index).get("/api/countries/gb/top-artists")
+    assert response.status_code == 404
+
+
+def test_unloaded_data_is_unavailable():
+    def index_loader():
+        abort(503, "The dashboard data is not loaded yet.")
+
+    response = api_client(index_loader).get("/api/weeks")
+    assert response.status_code == 503
+    assert response.get_json() == {"error": "The dashboard data is not loaded yet."}
@@ -0,0 +1,42 @@
+import pandas as pd
+
+from spotify_dash.core import engine
+
+
+def world_view():
+    return pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2020-01-03"] * 3 + ["2020-01-10"] * 3),
+            "ISO2": ["GB", "GB", "FR", "GB", "FR", "FR"],
+            "Artist": ["A", "B", "A", "B", "C", "A"],
+            "Genre": ["pop", "rock", "pop", "rock", "rap", "pop"],
+            "Streams": [5, 3, 4, 6, 9, 1],
+        }
+    ).set_index(["date", "ISO2", "Artist", "Genre"])
+
+
+def test_group_sum_matches_groupby():
+    df = world_view()
+    expected = df.groupby(["ISO2", "Genre"])["Streams"].sum().reset_index()
+    result = engine.group_sum(df, ["ISO2", "Genre"])
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_top_k_within_groups():
+    sums = engine.group_sum(world_view(), ["ISO2", "Artist"])
+    top = engine.top_k(sums, k=1, group="ISO2")
+    assert top.loc[:, ["ISO2", "Artist"]].values.tolist() == [["FR", "C"], ["GB", "B"]]
+
+
+def test_select_ignores_unknown_labels():
+    df = world_view().reset_index()
+    df["Genre"] = df["Genre"].astype("category").cat.remove_categories(["rap"])
+    assert engine.select(df, "Genre", ["pop", "jazz"]).tolist() == [
+        True,
+        False,
+        True,
+        False,
+        False,
+        True,
+    ]
+    assert not engine.select(df, "Genre", ["jazz"]).any()
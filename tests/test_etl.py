@@ -0,0 +1,250 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+import spotify_dash.core.views as views
+import spotify_dash.settings as sts
+import spotify_dash.utils.etl as etl
+
+
+def weekly_charts(dates, countries, streams=1):
+    # A chart of two tracks for each country and week
+    rows = [
+        [
+            position,
+            f"Song {position}",
+            "A",
+            streams,
+            f"url-{position}",
+            date,
+            iso2,
+            "pop",
+        ]
+        for date in pd.to_datetime(dates)
+        for iso2 in countries
+        for position in [1, 2]
+    ]
+    return pd.DataFrame(rows, columns=list(etl.SPOTIFY_ASSET_DTYPES)).astype(
+        etl.SPOTIFY_ASSET_DTYPES
+    )
+
+
+def test_upsert_charts_replaces_country_weeks():
+    hist_df = weekly_charts(["2020-01-03", "2020-01-10"], ["GB", "FR"])
+    new_df = weekly_charts(["2020-01-10", "2020-01-17"], ["GB"], streams=5)
+    result = etl.upsert_charts(hist_df, new_df)
+
+    streams = result.groupby(["date", "ISO2"], observed=True)["Streams"].sum()
+    assert streams.to_dict() == {
+        (pd.Timestamp("2020-01-03"), "FR"): 2,
+        (pd.Timestamp("2020-01-03"), "GB"): 2,
+        (pd.Timestamp("2020-01-10"), "FR"): 2,
+        (pd.Timestamp("2020-01-10"), "GB"): 10,
+        (pd.Timestamp("2020-01-17"), "GB"): 10,
+    }
+    assert result["date"].is_monotonic_increasing
+
+
+def test_upsert_charts_drops_expired_weeks():
+    hist_df = weekly_charts(["2020-01-03", "2020-01-10"], ["GB"])
+    new_df = weekly_charts(["2020-01-24"], ["GB"])
+    result = etl.upsert_charts(hist_df, new_df, retention=dt.timedelta(weeks=2))
+    assert result["date"].drop_duplicates().tolist() == [
+        pd.Timestamp("2020-01-10"),
+        pd.Timestamp("2020-01-24"),
+    ]
+
+
+def test_upsert_charts_with_empty_frames():
+    hist_df = weekly_charts(["2020-01-03", "2020-01-10"], ["GB"])
+    new_df = weekly_charts(["2020-01-17"], ["GB"])
+    empty_df = etl.load_partitions([])
+    retention = dt.timedelta(weeks=1)
+
+    result = etl.upsert_charts(hist_df, empty_df, retention=retention)
+    assert result["date"].drop_duplicates().tolist() == [
+        pd.Timestamp("2020-01-03"),
+        pd.Timestamp("2020-01-10"),
+    ]
+    result = etl.upsert_charts(empty_df, new_df)
+    assert len(result) == len(new_df)
+    assert etl.upsert_charts(empty_df, empty_df).empty
+
+
+def test_update_world_aggregates_matches_rebuild():
+    country_info = etl.load_country_info(sts.GEOGRAPHY_DATA_PATH)
+    # Totals over these streams overflow uint32
+    hist_df = weekly_charts(
+        ["2020-01-03", "2020-01-10", "2020-01-17"], ["GB", "FR"], streams=3 * 10 ** 9
+    )
+    new_df = weekly_charts(["2020-01-17", "2020-01-24"], ["GB"], streams=5)
+    spotify_all = etl.upsert_charts(hist_df, new_df, retention=dt.timedelta(weeks=2))
+
+    expected = etl.build_world_aggregates(spotify_all, country_info, depth=1)
+    result = etl.update_world_aggregates(
+        etl.build_world_aggregates(hist_df, country_info, depth=1),
+        new_df,
+        country_info,
+        start_date=spotify_all["date"].min(),
+    )
+    assert result["depth"] == expected["depth"]
+    pd.testing.assert_frame_equal(result["world_view"], expected["world_view"])
+    pd.testing.assert_series_equal(result["totals"], expected["totals"])
+    assert result["totals"].max() == 2 * 3 * 10 ** 9
+
+
+def test_artist_genre_weights_without_genre():
+    spotify_df = weekly_charts(["2020-01-03"], ["GB"])
+    spotify_df["Artist"] = pd.Categorical(["A", "B"])
+    # Artist B's genre lookup missed
+    spotify_df["Genre"] = pd.Categorical(["pop", None])
+    artist_genres = etl.build_artist_genre_weights(spotify_df, {"A": ["pop", "rock"]})
+
+    weights = pd.DataFrame(
+        artist_genres["weights"].toarray(),
+        index=artist_genres["artists"],
+        columns=artist_genres["genres"],
+    )
+    assert weights.loc["A"].to_dict() == {"pop": 0.5, "rock": 0.5, "Unknown": 0}
+    assert weights.loc["B"].to_dict() == {"pop": 0, "rock": 0, "Unknown": 1}
+
+
+def daily_charts():
+    # Two tracks in GB for a full chart week from Friday 2020-01-03, and one
+    # day of the following week
+    days = pd.date_range("2020-01-03", "2020-01-10")
+    urls = ["https://open.spotify.com/track/a", "https://open.spotify.com/track/b"]
+    return pd.DataFrame(
+        {
+            "Position": [1, 2] * len(days),
+            "Track Name": ["Song A", "Song B"] * len(days),
+            "Artist": ["A", "B"] * len(days),
+            "Streams": [10, 20] * len(days),
+            "URL": urls * len(days),
+            "date": days.repeat(2),
+            "ISO2": "GB",
+            "Genre": ["pop", "rock"] * len(days),
+        }
+    ).astype(etl.SPOTIFY_ASSET_DTYPES)
+
+
+def test_rollup_daily_to_weekly():
+    weekly = etl.rollup_daily_to_weekly(daily_charts())
+    # The partial week is dropped and tracks are re-ranked by weekly streams
+    assert weekly["date"].drop_duplicates().tolist() == [pd.Timestamp("2020-01-03")]
+    assert weekly.loc[:, ["Position", "Track Name", "Streams"]].values.tolist() == [
+        [1, "Song B", 140],
+        [2, "Song A", 70],
+    ]
+
+
+def test_load_partitions_without_partitions():
+    df = etl.load_partitions([])
+    assert df.empty
+    assert list(df.columns) == list(etl.SPOTIFY_ASSET_DTYPES)
+    assert df["Streams"].dtype == "uint32"
+
+
+def movement_assets():
+    # Three weeks of a three track GB chart: track 1 falls, track 2 climbs to the
+    # top, track 4 enters in week two and track 3 drops out then re-enters
+    weeks = {
+        "2020-01-03": [1, 2, 3],
+        "2020-01-10": [2, 1, 4],
+        "2020-01-17": [3, 2, 1],
+    }
+    track_charts = pd.DataFrame(
+        [
+            [pd.Timestamp(date), "GB", track, position, 100]
+            for date, tracks in weeks.items()
+            for position, track in enumerate(tracks, start=1)
+        ],
+        columns=["date", "ISO2", "Track", "Position", "Streams"],
+    ).astype({"ISO2": "category", "Track": "int32", "Position": "uint16"})
+    tracks = pd.DataFrame(
+        {"Track Name": [f"Song {code}" for code in range(5)], "Artist": "A"}
+    )
+    return {"tracks": tracks, "track_charts": track_charts}
+
+
+def test_chart_movements():
+    track_charts = etl.add_chart_movements(movement_assets()["track_charts"])
+    movements = track_charts.set_index(["date", "Track"])
+    assert movements.loc["2020-01-10", "Last Position"].to_dict() == {
+        2: 2,
+        1: 1,
+        4: 0,
+    }
+    # Track 3 re-enters: no last position, but its earlier week still counts
+    assert movements.loc["2020-01-17", "Last Position"].to_dict() == {
+        3: 0,
+        2: 1,
+        1: 2,
+    }
+    assert movements.loc["2020-01-17", "Weeks On Chart"].to_dict() == {
+        3: 2,
+        2: 3,
+        1: 3,
+    }
+
+
+def test_chart_movement_view():
+    assets = movement_assets()
+    new_entries, climbers, longest_running = views.chart_movement_view(
+        assets, "GB", week="2020-01-10"
+    )
+    assert new_entries["Track"].tolist() == [4]
+    assert climbers["Track"].tolist() == [2]
+    assert climbers["Change"].tolist() == [1]
+
+    new_entries, climbers, longest_running = views.chart_movement_view(assets, "GB")
+    assert new_entries.empty
+    assert climbers.empty
+    assert longest_running["Track"].tolist() == [2, 1, 3]
+
+
+def test_chart_movement_view_at_depth():
+    # Only the top two are shown, so track 3 enters in week three, and track 1
+    # leaves the chart before it
+    new_entries, _, longest_running = views.chart_movement_view(
+        movement_assets(), "GB", depth=2
+    )
+    assert new_entries["Track"].tolist() == [3]
+    assert longest_running["Track"].tolist() == [2, 3]
+    assert longest_running["Weeks On Chart"].tolist() == [3, 1]
+
+
+def test_concentration_metrics():
+    # FR charts four artists, one of them twice. GB charts twelve single-track
+    # artists, all pop, plus a thirteenth below the depth.
+    fr = [("A", 25, "pop"), ("B", 30, "pop"), ("C", 20, "rock"), ("A", 15, "pop")]
+    fr += [("D", 10, "rap")]
+    gb = [(f"G{i}", 20 if i < 2 else 10, "pop") for i in range(12)]
+    gb += [("G12", 1000, "rock")]
+    date = pd.Timestamp("2020-01-03")
+    rows = [
+        [position, f"Song {position}", artist, streams, "url", date, iso2, genre]
+        for iso2, chart in [("FR", fr), ("GB", gb)]
+        for position, (artist, streams, genre) in enumerate(chart, start=1)
+    ]
+    spotify_df = pd.DataFrame(rows, columns=list(etl.SPOTIFY_ASSET_DTYPES)).astype(
+        etl.SPOTIFY_ASSET_DTYPES
+    )
+
+    metrics = etl.build_concentration_metrics(spotify_df, depth=12).set_index("ISO2")
+    expected = pd.DataFrame(
+        {
+            "Top 10 Artist Share": [1.0, 120 / 140],
+            "Artist HHI": [0.4 ** 2 + 0.3 ** 2 + 0.2 ** 2 + 0.1 ** 2, 1800 / 140 ** 2],
+            "Genre HHI": [0.7 ** 2 + 0.2 ** 2 + 0.1 ** 2, 1.0],
+            "Genre Entropy": [
+                -(0.7 * np.log(0.7) + 0.2 * np.log(0.2) + 0.1 * np.log(0.1)),
+                0.0,
+            ],
+        },
+        index=pd.Index(["FR", "GB"], name="ISO2"),
+    )
+    pd.testing.assert_frame_equal(
+        metrics.loc[:, etl.CONCENTRATION_METRICS], expected, check_exact=False
+    )
@@ -0,0 +1,41 @@
+import _pickle as cpickle
+import bz2
+
+import pandas as pd
+import pytest
+
+import spotify_dash.utils.io as iou
+
+
+def frame():
+    return pd.DataFrame(
+        {"ISO2": pd.Categorical(["GB", "FR", "GB"]), "Streams": [3, 2, 1]}
+    )
+
+
+@pytest.mark.parametrize(
+    "codec",
+    [
+        pytest.param(
+            codec,
+            marks=pytest.mark.skipif(
+                not iou.codec_available(codec), reason=f"{codec} is not installed"
+            ),
+        )
+        for codec in iou.CODECS
+    ],
+)
+def test_compress_pickle_round_trip(tmp_path, codec):
+    file_path = tmp_path / "asset.pkl.bz"
+    iou.compress_pickle(file_path, frame(), codec=codec)
+    assert iou.sniff_codec(file_path) == codec
+    pd.testing.assert_frame_equal(iou.decompress_pickle(file_path), frame())
+
+
+def test_decompress_legacy_bz2(tmp_path):
+    # Assets written before the codec setting were bz2 streams of a plain pickle
+    file_path = tmp_path / "asset.pkl.bz"
+    with bz2.BZ2File(file_path, "w") as f:
+        cpickle.dump(frame(), f)
+    assert iou.sniff_codec(file_path) == "bz2"
+    pd.testing.assert_frame_equal(iou.decompress_pickle(file_path), frame())
@@ -0,0 +1,62 @@
+import asyncio
+import datetime as dt
+
+import pandas as pd
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import spotify_dash.utils.etl as etl
+from spotify_dash.utils.spotify import SpotifyDownloader
+
+
+STREAMS = {"gb": 300, "fr": 200, "us": 100}
+
+
+def chart_csv(country):
+    return (
+        "Note\n"
+        f"{etl.CHART_COLUMNS}\n"
+        f'1,"Song 1",A,{STREAMS[country]},https://open.spotify.com/track/1\n'
+        '2,"Song 2",B,50,https://open.spotify.com/track/2\n'
+    )
+
+
+def test_stream_parses_bodies(tmp_path):
+    async def chart(request):
+        return web.Response(text=chart_csv(request.match_info["country"]))
+
+    app = web.Application()
+    app.router.add_get("/{country}/weekly/{period}/download", chart)
+
+    downloader = SpotifyDownloader(
+        tmp_path,
+        start_date=dt.datetime(2020, 1, 3),
+        end_date=dt.datetime(2020, 1, 17),
+        countries=["gb", "fr", "us"],
+    )
+    downloader.is_available = lambda: True
+    parser = etl.ChartStreamParser()
+
+    async def stream(loop):
+        async with TestServer(app) as server:
+            downloader.base_url = str(server.make_url("")).rstrip("/")
+            return await downloader.stream(loop, parser, fetchers=2)
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(stream(loop))
+    finally:
+        loop.close()
+
+    df = parser.to_frame()
+    # Two tracks for each of three countries and two weeks
+    assert len(df) == 12
+    assert df["date"].drop_duplicates().sort_values().tolist() == [
+        pd.Timestamp("2020-01-03"),
+        pd.Timestamp("2020-01-10"),
+    ]
+    assert df.groupby("ISO2", observed=True)["Streams"].sum().to_dict() == {
+        "FR": 500,
+        "GB": 700,
+        "US": 300,
+    }
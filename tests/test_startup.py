@@ -0,0 +1,64 @@
+import json
+
+import pandas as pd
+import pytest
+
+import spotify_dash.settings as sts
+import spotify_dash.utils.etl as etl
+import spotify_dash.utils.io as iou
+from spotify_dash.utils import profiling
+
+
+def chart_fixture():
+    # Four weeks of a ten track chart in three countries
+    rows = [
+        [
+            position,
+            f"Song {position}",
+            f"Artist {position % 6}",
+            1000 * (11 - position) + len(iso2) * week,
+            f"https://open.spotify.com/track/{position}",
+            date,
+            iso2,
+            ["pop", "rock", "rap"][position % 3],
+        ]
+        for week, date in enumerate(pd.date_range("2020-01-03", periods=4, freq="7D"))
+        for iso2 in ["GB", "FR", "US"]
+        for position in range(1, 11)
+    ]
+    return pd.DataFrame(rows, columns=list(etl.SPOTIFY_ASSET_DTYPES)).astype(
+        etl.SPOTIFY_ASSET_DTYPES
+    )
+
+
+@pytest.fixture(scope="module")
+def cold_start(tmp_path_factory):
+    # The dashboard's cold start on local assets: the chart asset, its derived
+    # tables and a snapshot of another asset version, so every section is rendered
+    asset_dir = tmp_path_factory.mktemp("assets")
+    spotify_df = chart_fixture()
+    asset_path = asset_dir / "spotify_data.pkl.bz"
+    derived_asset_path = asset_dir / "spotify_derived.pkl.bz"
+    snapshot_path = asset_dir / "dashboard-snapshot.json"
+
+    iou.compress_pickle(asset_path, spotify_df, codec=sts.SPOTIFY_ASSET_CODEC)
+    iou.compress_pickle(
+        derived_asset_path,
+        etl.build_derived_assets(spotify_df),
+        codec=sts.SPOTIFY_DERIVED_ASSET_CODEC,
+    )
+    snapshot_path.write_text(json.dumps({"versions": [], "layout": None}))
+
+    return profiling.cold_start(
+        asset_path, derived_asset_path, snapshot_path, cwd=asset_dir
+    )
+
+
+def test_startup_within_budget(cold_start):
+    assert cold_start["import"] < sts.STARTUP_BUDGET_SECONDS
+
+
+def test_startup_defers_heavy_imports(cold_start):
+    packages = {name.split(".")[0] for name in cold_start["modules"]}
+    assert "sklearn" not in packages
+    assert "boto3" not in packages